@@ -66,6 +66,17 @@ class Camera:
     def z_far(self):
         return self.__z_far
 
+    def projected_size(self, center, radius, proj_mode):
+        """diameter in pixels of a sphere on screen, None when the eye is inside of it"""
+        if (center - self.__eye_pos).length() <= radius:
+            return None
+
+        if proj_mode == PROJ_MODE_PERSPECTIVE:
+            distance = (center - self.__eye_pos).length()
+        else:
+            distance = (self.__eye_center - self.__eye_pos).length()    # the ortho view is sized by it
+        return radius * self.__viewport_h / (distance * math.tan(math.radians(self.__fovy) * 0.5))
+
     def zoom(self, factor):
         """zoom in or zoom out the view"""
         eye_backward = self.__eye_pos - self.__eye_center
@@ -93,12 +104,10 @@ class Camera:
         eye_right = Vec3.cross_product(eye_forward, self.__eye_up)
         eye_right.normalize()
 
-        delta_right = eye_right * side_move
-        delta_up = self.__eye_up * up_move
-        total_delta = delta_right + delta_up
+        total_delta = eye_right.imul_scalar(side_move).iadd(self.__eye_up * up_move)
 
-        self.__eye_pos += total_delta
-        self.__eye_center += total_delta
+        self.__eye_pos.iadd(total_delta)
+        self.__eye_center.iadd(total_delta)
 
     def rotate_around_center(self, delta_yaw_in_rad: float, delta_pitch_in_rad: float):
         """rotate the camera around the viewing center"""
@@ -3,9 +3,21 @@ mathlib etc.
 
 """
 
+import io
 import math
+import os
+import pickle
+import time
+import traceback
+import multiprocessing
+import concurrent.futures
+import numpy as np
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future
+from multiprocessing.shared_memory import SharedMemory
 from threading import Thread
+import queue
 from queue import Queue     # python built-in thread-safe queue
 
 
@@ -28,7 +40,8 @@ def inv(f):
 # Vec2
 # ------------------------------------------------------------------------------#
 class Vec2:
-    
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -55,6 +68,25 @@ class Vec2:
     
     def __mul__(self, factor):
         return Vec2(self.x * factor, self.y * factor)
+
+    def iadd(self, other):
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def isub(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def imul_scalar(self, factor):
+        self.x *= factor
+        self.y *= factor
+        return self
+
+    __iadd__ = iadd
+    __isub__ = isub
+    __imul__ = imul_scalar
     
     def length(self):
         return math.sqrt(self.x * self.x + self.y * self.y)
@@ -78,6 +110,7 @@ class Vec2:
 
 
 class Vec3:
+    __slots__ = ('x', 'y', 'z')
 
     def __init__(self, x, y, z):
         self.x = x
@@ -109,6 +142,28 @@ class Vec3:
     def __mul__(self, factor):
         return Vec3(self.x * factor, self.y * factor, self.z * factor)
 
+    def iadd(self, other):
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        return self
+
+    def isub(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        self.z -= other.z
+        return self
+
+    def imul_scalar(self, factor):
+        self.x *= factor
+        self.y *= factor
+        self.z *= factor
+        return self
+
+    __iadd__ = iadd
+    __isub__ = isub
+    __imul__ = imul_scalar
+
     def length(self):
         return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
 
@@ -127,13 +182,9 @@ class Vec3:
 
     @staticmethod
     def cross_product(v1, v2):
-        r = Vec3(0.0, 0.0, 0.0)
-
-        r.x = v1.y * v2.z - v1.z * v2.y
-        r.y = v1.z * v2.x - v1.x * v2.z
-        r.z = v1.x * v2.y - v1.y * v2.x
-
-        return r
+        return Vec3(v1.y * v2.z - v1.z * v2.y,
+                    v1.z * v2.x - v1.x * v2.z,
+                    v1.x * v2.y - v1.y * v2.x)
 
     
 # ------------------------------------------------------------------------------#
@@ -142,6 +193,7 @@ class Vec3:
 
 
 class Vec4:
+    __slots__ = ('x', 'y', 'z', 'w')
 
     def __init__(self, x, y, z, w):
         self.x = x
@@ -175,6 +227,32 @@ class Vec4:
 
     def __mul__(self, factor):
         return Vec4(self.x * factor, self.y * factor, self.z * factor, self.w * factor)
+
+    def iadd(self, other):
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        self.w += other.w
+        return self
+
+    def isub(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        self.z -= other.z
+        self.w -= other.w
+        return self
+
+    def imul_scalar(self, factor):
+        self.x *= factor
+        self.y *= factor
+        self.z *= factor
+        self.w *= factor
+        return self
+
+    __iadd__ = iadd
+    __isub__ = isub
+    __imul__ = imul_scalar
+
   
 # ------------------------------------------------------------------------------#
 # Mat3
@@ -182,73 +260,37 @@ class Vec4:
 
 
 class Mat3:
+    """3x3 matrix, m holds the 9 elements column by column, row r of column c is m[c * 3 + r]"""
+    __slots__ = ('m',)
+
     def __init__(self):
-        self.elem = [Vec3(1.0, 0.0, 0.0),
-                     Vec3(0.0, 1.0, 0.0),
-                     Vec3(0.0, 0.0, 1.0)]
+        self.m = [1.0, 0.0, 0.0,
+                  0.0, 1.0, 0.0,
+                  0.0, 0.0, 1.0]
 
     def identity(self):
-        self.elem[0].set(1.0, 0.0, 0.0)
-        self.elem[1].set(0.0, 1.0, 0.0)
-        self.elem[2].set(0.0, 0.0, 1.0)
+        self.m[:] = (1.0, 0.0, 0.0,
+                     0.0, 1.0, 0.0,
+                     0.0, 0.0, 1.0)
 
     def zero(self):
-        self.elem[0].zero()
-        self.elem[1].zero()
-        self.elem[2].zero()
+        self.m[:] = (0.0,) * 9
 
     def __mul__(self, other):
-        r = Mat3()
-
-        # x
-        r.elem[0].x = \
-            self.elem[0].x * other.elem[0].x + \
-            self.elem[1].x * other.elem[0].y + \
-            self.elem[2].x * other.elem[0].z
-
-        r.elem[1].x = \
-            self.elem[0].x * other.elem[1].x + \
-            self.elem[1].x * other.elem[1].y + \
-            self.elem[2].x * other.elem[1].z
-
-        r.elem[2].x = \
-            self.elem[0].x * other.elem[2].x + \
-            self.elem[1].x * other.elem[2].y + \
-            self.elem[2].x * other.elem[2].z
-
-        # y
-        r.elem[0].y = \
-            self.elem[0].y * other.elem[0].x + \
-            self.elem[1].y * other.elem[0].y + \
-            self.elem[2].y * other.elem[0].z
-
-        r.elem[1].y = \
-            self.elem[0].y * other.elem[1].x + \
-            self.elem[1].y * other.elem[1].y + \
-            self.elem[2].y * other.elem[1].z
-
-        r.elem[2].y = \
-            self.elem[0].y * other.elem[2].x + \
-            self.elem[1].y * other.elem[2].y + \
-            self.elem[2].y * other.elem[2].z
-
-        # z
-        r.elem[0].z = \
-            self.elem[0].z * other.elem[0].x + \
-            self.elem[1].z * other.elem[0].y + \
-            self.elem[2].z * other.elem[0].z
-
-        r.elem[1].z = \
-            self.elem[0].z * other.elem[1].x + \
-            self.elem[1].z * other.elem[1].y + \
-            self.elem[2].z * other.elem[1].z
-
-        r.elem[2].z = \
-            self.elem[0].z * other.elem[2].x + \
-            self.elem[1].z * other.elem[2].y + \
-            self.elem[2].z * other.elem[2].z
-
-        return r
+        return self.mul_into(other, Mat3())
+
+    def mul_into(self, other, out):
+        """out = self * other, out may be self or other"""
+        a0, a1, a2, a3, a4, a5, a6, a7, a8 = self.m
+        b = other.m
+        r = []
+        for c in (0, 3, 6):
+            b0, b1, b2 = b[c:c + 3]
+            r += (a0 * b0 + a3 * b1 + a6 * b2,
+                  a1 * b0 + a4 * b1 + a7 * b2,
+                  a2 * b0 + a5 * b1 + a8 * b2)
+        out.m[:] = r
+        return out
 
     def rotate(self, rad, vec3_axes):
         axes = Vec3(vec3_axes.x, vec3_axes.y, vec3_axes.z)
@@ -270,32 +312,27 @@ class Mat3:
         ys = y * s
         zs = z * s
 
-        self.elem[0].x = c + x * x * one_minus_c
-        self.elem[0].y = xy_one_minus_c + zs
-        self.elem[0].z = xz_one_minus_c - ys
-
-        self.elem[1].x = xy_one_minus_c - zs
-        self.elem[1].y = c + y * y * one_minus_c
-        self.elem[1].z = yz_one_minus_c + xs
-
-        self.elem[2].x = xz_one_minus_c + ys
-        self.elem[2].y = yz_one_minus_c - xs
-        self.elem[2].z = c + z * z * one_minus_c
+        self.m[:] = (c + x * x * one_minus_c, xy_one_minus_c + zs, xz_one_minus_c - ys,
+                     xy_one_minus_c - zs, c + y * y * one_minus_c, yz_one_minus_c + xs,
+                     xz_one_minus_c + ys, yz_one_minus_c - xs, c + z * z * one_minus_c)
 
     def transform(self, vec3):
         r = Vec3(0.0, 0.0, 0.0)
-
-        r.x = self.elem[0].x * vec3.x + self.elem[1].x * vec3.y + self.elem[2].x * vec3.z
-        r.y = self.elem[0].y * vec3.x + self.elem[1].y * vec3.y + self.elem[2].y * vec3.z
-        r.z = self.elem[0].z * vec3.x + self.elem[1].z * vec3.y + self.elem[2].z * vec3.z
-
+        self.transform_into(vec3, r)
         return r
 
+    def transform_into(self, vec3, out):
+        """out = self * vec3, out may be vec3"""
+        m = self.m
+        x = vec3.x
+        y = vec3.y
+        z = vec3.z
+        out.x = m[0] * x + m[3] * y + m[6] * z
+        out.y = m[1] * x + m[4] * y + m[7] * z
+        out.z = m[2] * x + m[5] * y + m[8] * z
+
     def transform_inplace(self, vec3):
-        r = self.transform(vec3)
-        vec3.x = r.x
-        vec3.y = r.y
-        vec3.z = r.z
+        self.transform_into(vec3, vec3)
 
 
 # ------------------------------------------------------------------------------#
@@ -304,128 +341,40 @@ class Mat3:
 
 
 class Mat4:
+    """4x4 matrix, m holds the 16 elements column by column, row r of column c is m[c * 4 + r]"""
+    __slots__ = ('m',)
+
     def __init__(self):
-        self.elem = [Vec4(1.0, 0.0, 0.0, 0.0),
-                     Vec4(0.0, 1.0, 0.0, 0.0),
-                     Vec4(0.0, 0.0, 1.0, 0.0),
-                     Vec4(0.0, 0.0, 0.0, 1.0)]
+        self.m = [1.0, 0.0, 0.0, 0.0,
+                  0.0, 1.0, 0.0, 0.0,
+                  0.0, 0.0, 1.0, 0.0,
+                  0.0, 0.0, 0.0, 1.0]
         
     def identity(self):
-        self.elem[0].set(1.0, 0.0, 0.0, 0.0)
-        self.elem[1].set(0.0, 1.0, 0.0, 0.0)
-        self.elem[2].set(0.0, 0.0, 1.0, 0.0)
-        self.elem[3].set(0.0, 0.0, 0.0, 1.0)
+        self.m[:] = (1.0, 0.0, 0.0, 0.0,
+                     0.0, 1.0, 0.0, 0.0,
+                     0.0, 0.0, 1.0, 0.0,
+                     0.0, 0.0, 0.0, 1.0)
         
     def zero(self):
-        self.elem[0].zero()
-        self.elem[1].zero()
-        self.elem[2].zero()
-        self.elem[3].zero()
+        self.m[:] = (0.0,) * 16
         
     def __mul__(self, other):
-        r = Mat4()  # create a new matrix to store the multiplication result
-
-        # x
-        r.elem[0].x = \
-            self.elem[0].x * other.elem[0].x + \
-            self.elem[1].x * other.elem[0].y + \
-            self.elem[2].x * other.elem[0].z + \
-            self.elem[3].x * other.elem[0].w
-        
-        r.elem[1].x = \
-            self.elem[0].x * other.elem[1].x + \
-            self.elem[1].x * other.elem[1].y + \
-            self.elem[2].x * other.elem[1].z + \
-            self.elem[3].x * other.elem[1].w
-    
-        r.elem[2].x = \
-            self.elem[0].x * other.elem[2].x + \
-            self.elem[1].x * other.elem[2].y + \
-            self.elem[2].x * other.elem[2].z + \
-            self.elem[3].x * other.elem[2].w
-        
-        r.elem[3].x = \
-            self.elem[0].x * other.elem[3].x + \
-            self.elem[1].x * other.elem[3].y + \
-            self.elem[2].x * other.elem[3].z + \
-            self.elem[3].x * other.elem[3].w
-
-        # y
-        r.elem[0].y = \
-            self.elem[0].y * other.elem[0].x + \
-            self.elem[1].y * other.elem[0].y + \
-            self.elem[2].y * other.elem[0].z + \
-            self.elem[3].y * other.elem[0].w
-
-        r.elem[1].y = \
-            self.elem[0].y * other.elem[1].x + \
-            self.elem[1].y * other.elem[1].y + \
-            self.elem[2].y * other.elem[1].z + \
-            self.elem[3].y * other.elem[1].w
-
-        r.elem[2].y = \
-            self.elem[0].y * other.elem[2].x + \
-            self.elem[1].y * other.elem[2].y + \
-            self.elem[2].y * other.elem[2].z + \
-            self.elem[3].y * other.elem[2].w
-
-        r.elem[3].y = \
-            self.elem[0].y * other.elem[3].x + \
-            self.elem[1].y * other.elem[3].y + \
-            self.elem[2].y * other.elem[3].z + \
-            self.elem[3].y * other.elem[3].w
-        
-        # z
-        r.elem[0].z = \
-            self.elem[0].z * other.elem[0].x + \
-            self.elem[1].z * other.elem[0].y + \
-            self.elem[2].z * other.elem[0].z + \
-            self.elem[3].z * other.elem[0].w
-
-        r.elem[1].z = \
-            self.elem[0].z * other.elem[1].x + \
-            self.elem[1].z * other.elem[1].y + \
-            self.elem[2].z * other.elem[1].z + \
-            self.elem[3].z * other.elem[1].w
-
-        r.elem[2].z = \
-            self.elem[0].z * other.elem[2].x + \
-            self.elem[1].z * other.elem[2].y + \
-            self.elem[2].z * other.elem[2].z + \
-            self.elem[3].z * other.elem[2].w
-
-        r.elem[3].z = \
-            self.elem[0].z * other.elem[3].x + \
-            self.elem[1].z * other.elem[3].y + \
-            self.elem[2].z * other.elem[3].z + \
-            self.elem[3].z * other.elem[3].w
-    
-        # w
-        r.elem[0].w = \
-            self.elem[0].w * other.elem[0].x + \
-            self.elem[1].w * other.elem[0].y + \
-            self.elem[2].w * other.elem[0].z + \
-            self.elem[3].w * other.elem[0].w
-
-        r.elem[1].w = \
-            self.elem[0].w * other.elem[1].x + \
-            self.elem[1].w * other.elem[1].y + \
-            self.elem[2].w * other.elem[1].z + \
-            self.elem[3].w * other.elem[1].w
-
-        r.elem[2].w = \
-            self.elem[0].w * other.elem[2].x + \
-            self.elem[1].w * other.elem[2].y + \
-            self.elem[2].w * other.elem[2].z + \
-            self.elem[3].w * other.elem[2].w
-
-        r.elem[3].w = \
-            self.elem[0].w * other.elem[3].x + \
-            self.elem[1].w * other.elem[3].y + \
-            self.elem[2].w * other.elem[3].z + \
-            self.elem[3].w * other.elem[3].w
-    
-        return r
+        return self.mul_into(other, Mat4())
+
+    def mul_into(self, other, out):
+        """out = self * other, out may be self or other"""
+        a0, a1, a2, a3, a4, a5, a6, a7, a8, a9, a10, a11, a12, a13, a14, a15 = self.m
+        b = other.m
+        r = []
+        for c in (0, 4, 8, 12):
+            b0, b1, b2, b3 = b[c:c + 4]
+            r += (a0 * b0 + a4 * b1 + a8 * b2 + a12 * b3,
+                  a1 * b0 + a5 * b1 + a9 * b2 + a13 * b3,
+                  a2 * b0 + a6 * b1 + a10 * b2 + a14 * b3,
+                  a3 * b0 + a7 * b1 + a11 * b2 + a15 * b3)
+        out.m[:] = r
+        return out
         
     def look_at(self, vec3_eye, vec3_center, vec3_up):
         forward = vec3_center - vec3_eye
@@ -435,24 +384,12 @@ class Mat4:
         up_.normalize()
         
         side = Vec3.cross_product(forward, up_)
-        
-        self.elem[0].x = side.x
-        self.elem[1].x = side.y
-        self.elem[2].x = side.z
-        self.elem[3].x = -Vec3.dot_product(side, vec3_eye)
-        
-        self.elem[0].y = up_.x
-        self.elem[1].y = up_.y
-        self.elem[2].y = up_.z
-        self.elem[3].y = -Vec3.dot_product(up_, vec3_eye)
-        
-        self.elem[0].z = -forward.x
-        self.elem[1].z = -forward.y
-        self.elem[2].z = -forward.z
-        self.elem[3].z = Vec3.dot_product(forward, vec3_eye)
-        
-        self.elem[0].w = self.elem[1].w = self.elem[2].w = 0.0
-        self.elem[3].w = 1.0
+
+        self.m[:] = (side.x, up_.x, -forward.x, 0.0,
+                     side.y, up_.y, -forward.y, 0.0,
+                     side.z, up_.z, -forward.z, 0.0,
+                     -Vec3.dot_product(side, vec3_eye), -Vec3.dot_product(up_, vec3_eye),
+                     Vec3.dot_product(forward, vec3_eye), 1.0)
     
     def perspective(self, fovy_rad, width_over_height, z_near, z_far):
         t = math.tan(fovy_rad * 0.5)
@@ -475,14 +412,15 @@ class Mat4:
         f_sub_n = z_far - z_near
 
         inv_f_sub_n = inv(f_sub_n)
-        
-        self.elem[0].x = n_mul_2 / r_sub_l
-        self.elem[1].y = n_mul_2 / t_sub_b
-        self.elem[2].x = r_add_l / r_sub_l
-        self.elem[2].y = t_add_b / t_sub_b
-        self.elem[2].z = -f_add_n * inv_f_sub_n
-        self.elem[2].w = -1.0
-        self.elem[3].z = -2.0 * z_near * z_far * inv_f_sub_n
+
+        m = self.m
+        m[0] = n_mul_2 / r_sub_l
+        m[5] = n_mul_2 / t_sub_b
+        m[8] = r_add_l / r_sub_l
+        m[9] = t_add_b / t_sub_b
+        m[10] = -f_add_n * inv_f_sub_n
+        m[11] = -1.0
+        m[14] = -2.0 * z_near * z_far * inv_f_sub_n
 
     # make an orthographic projection matrix
     def ortho(self, left, right, bottom, top, z_near, z_far):
@@ -492,13 +430,14 @@ class Mat4:
         t_sub_b = top - bottom
         f_sub_n = z_far - z_near
 
-        self.elem[0].x = 2.0 / r_sub_l
-        self.elem[1].y = 2.0 / t_sub_b
-        self.elem[2].z = -2.0 / f_sub_n
-        self.elem[3].x = -(right + left) / r_sub_l
-        self.elem[3].y = -(top + bottom) / t_sub_b
-        self.elem[3].z = -(z_far + z_near) / f_sub_n
-        self.elem[3].w = 1.0
+        m = self.m
+        m[0] = 2.0 / r_sub_l
+        m[5] = 2.0 / t_sub_b
+        m[10] = -2.0 / f_sub_n
+        m[12] = -(right + left) / r_sub_l
+        m[13] = -(top + bottom) / t_sub_b
+        m[14] = -(z_far + z_near) / f_sub_n
+        m[15] = 1.0
 
     # make a rotation matrix: rotate point around an axes specified in vec3_axes by rad angle
     def rotate(self, rad, vec3_axes):
@@ -520,66 +459,104 @@ class Mat4:
         xs = x * s
         ys = y * s
         zs = z * s
-        
-        self.elem[0].x = c + x * x * one_minus_c
-        self.elem[0].y = xy_one_minus_c + zs
-        self.elem[0].z = xz_one_minus_c - ys
-        self.elem[0].w = 0.0
-
-        self.elem[1].x = xy_one_minus_c - zs
-        self.elem[1].y = c + y * y * one_minus_c
-        self.elem[1].z = yz_one_minus_c + xs
-        self.elem[1].w = 0.0
-        
-        self.elem[2].x = xz_one_minus_c + ys
-        self.elem[2].y = yz_one_minus_c - xs
-        self.elem[2].z = c + z * z * one_minus_c
-        self.elem[2].w = 0.0
-        
-        self.elem[3].x = 0.0
-        self.elem[3].y = 0.0
-        self.elem[3].z = 0.0
-        self.elem[3].w = 0.0
+
+        self.m[:] = (c + x * x * one_minus_c, xy_one_minus_c + zs, xz_one_minus_c - ys, 0.0,
+                     xy_one_minus_c - zs, c + y * y * one_minus_c, yz_one_minus_c + xs, 0.0,
+                     xz_one_minus_c + ys, yz_one_minus_c - xs, c + z * z * one_minus_c, 0.0,
+                     0.0, 0.0, 0.0, 0.0)
         
     def scale(self, sx, sy, sz):
         self.zero()
-        self.elem[0].x = sx
-        self.elem[1].y = sy
-        self.elem[2].z = sz
-        self.elem[3].w = 1.0
+        m = self.m
+        m[0] = sx
+        m[5] = sy
+        m[10] = sz
+        m[15] = 1.0
     
     def translate(self, dx, dy, dz):
         self.identity()
-        self.elem[3].x = dx
-        self.elem[3].y = dy
-        self.elem[3].z = dz
+        m = self.m
+        m[12] = dx
+        m[13] = dy
+        m[14] = dz
 
     def transform(self, vec4):
         r = Vec4(0.0, 0.0, 0.0, 0.0)
-
-        r.x = self.elem[0].x * vec4.x + self.elem[1].x * vec4.y + self.elem[2].x * vec4.z + self.elem[3].x * vec4.w
-        r.y = self.elem[0].y * vec4.x + self.elem[1].y * vec4.y + self.elem[2].y * vec4.z + self.elem[3].y * vec4.w
-        r.z = self.elem[0].z * vec4.x + self.elem[1].z * vec4.y + self.elem[2].z * vec4.z + self.elem[3].z * vec4.w
-        r.w = self.elem[0].w * vec4.x + self.elem[1].w * vec4.y + self.elem[2].w * vec4.z + self.elem[3].w * vec4.w
-    
+        self.transform_into(vec4, r)
         return r
 
+    def transform_into(self, vec4, out):
+        """out = self * vec4, out may be vec4"""
+        m = self.m
+        x = vec4.x
+        y = vec4.y
+        z = vec4.z
+        w = vec4.w
+        out.x = m[0] * x + m[4] * y + m[8] * z + m[12] * w
+        out.y = m[1] * x + m[5] * y + m[9] * z + m[13] * w
+        out.z = m[2] * x + m[6] * y + m[10] * z + m[14] * w
+        out.w = m[3] * x + m[7] * y + m[11] * z + m[15] * w
+
     def transform_inplace(self, vec4):
-        r = self.transform(vec4)
-        vec4.x = r.x
-        vec4.y = r.y
-        vec4.z = r.z
-        vec4.w = r.w
+        self.transform_into(vec4, vec4)
+
+    def transform_points(self, points):
+        """(4, N) float64 array of self * points, see transform_points_into"""
+        return self.transform_points_into(points, np.empty((4, len(points)), np.float64))
+
+    def transform_points_into(self, points, out):
+        """out = self * points, one column per point
+
+        points: (N, 3) with a w of 1.0 or (N, 4), float64 points are read in place, others are converted to a
+        float64 copy first
+        out: (4, N) float64 array, returned
+        """
+        mat = self.to_array()
+        points = np.asarray(points, np.float64)
+        if points.shape[1] == 3:
+            np.matmul(mat[:, :3], points.T, out=out)
+            out += mat[:, 3:]
+        else:
+            np.matmul(mat, points.T, out=out)
+        return out
+
+    def to_array(self):
+        """row major (4, 4) numpy copy"""
+        return np.array(self.m).reshape(4, 4).T
 
+    @staticmethod
+    def from_array(array):
+        """Mat4 of a row major (4, 4) array"""
+        r = Mat4()
+        r.m[:] = np.asarray(array, np.float64).T.ravel().tolist()
+        return r
 # ------------------------------------------------------------------------------#
-# Line3D
+# WireframeModel
 # ------------------------------------------------------------------------------#
 
 
-class Line3D:
-    def __init__(self, vec3_pt1, vec3_pt2):
-        self.pt1 = vec3_pt1
-        self.pt2 = vec3_pt2
+class WireframeModel:
+    """vertices: (N, 3) float32 positions, float64 when the file declares them so, edges: (E, 2) int32 indices
+    into vertices
+
+    properties: {element name: {property name: column}} of the other per element data in the file
+    lod_levels: [LodLevel] simplified versions of the model, finest first, filled in by a LodBuilder
+    bvh: EdgeBvh over the edges, which are then kept in the order of its leaves
+    """
+
+    def __init__(self, vertices, edges, model_min, model_max, properties=None):
+        self.vertices = vertices
+        self.edges = edges
+        self.model_min = model_min
+        self.model_max = model_max
+        self.properties = properties if properties is not None else {}
+        self.lod_levels = []
+        self.bvh = None
+
+    @staticmethod
+    def empty():
+        return WireframeModel(np.zeros((0, 3), np.float32), np.zeros((0, 2), np.int32),
+                              Vec3(0.0, 0.0, 0.0), Vec3(0.0, 0.0, 0.0))
 
     
 # ------------------------------------------------------------------------------#
@@ -599,13 +576,109 @@ class CanvasIntf(ABC):
     def draw_line(self, vec2_pt1, vec2_pt2):
         pass
 
+    def draw_lines(self, lines):
+        """lines: (N, 4) array of x1, y1, x2, y2 in screen space"""
+        for x1, y1, x2, y2 in lines.tolist():
+            self.draw_line(Vec2(x1, y1), Vec2(x2, y2))
+
+    def present(self):
+        """called once the lines of a frame are all drawn, from clear() on"""
+        pass
+
 
 # ------------------------------------------------------------------------------#
 # ParallelJobSys
 # ------------------------------------------------------------------------------#
 
 
+# shared memory blocks a worker process has attached to, most recently used last
+g_attached_blocks = OrderedDict()
+MAX_ATTACHED_BLOCKS = 16
+
+
+def attach_shared_array(block_name, offset, shape, strides, dtype):
+    """rebuild, inside a worker process, an array that lives in the shared memory block block_name"""
+    if block_name in g_attached_blocks:
+        g_attached_blocks.move_to_end(block_name)
+        shm, data = g_attached_blocks[block_name]
+    else:
+        shm = SharedMemory(block_name)
+        data = np.frombuffer(shm.buf, np.uint8)
+        g_attached_blocks[block_name] = (shm, data)
+
+        while len(g_attached_blocks) > MAX_ATTACHED_BLOCKS:
+            detach_shared_block(g_attached_blocks.popitem(last=False)[1][0])
+
+    return np.ndarray(shape, dtype, buffer=data, offset=offset, strides=strides)
+
+
+def detach_shared_block(shm):
+    try:
+        shm.close()
+    except BufferError:
+        pass    # still used by an array, unmapped once that is gone
+
+
+def run_job_process(job_queue, result_queue):
+    # main loop of a worker process
+    while True:
+        item = job_queue.get()
+        if item is None:
+            break
+
+        job_id, payload = item
+        start_time = time.perf_counter()
+        try:
+            result = pickle.loads(payload).exec()
+            result_queue.put((job_id, result, None, time.perf_counter() - start_time))
+        except Exception:
+            result_queue.put((job_id, None, traceback.format_exc(), time.perf_counter() - start_time))
+
+    while g_attached_blocks:
+        detach_shared_block(g_attached_blocks.popitem()[1][0])
+
+
+class JobFuture(Future):
+    """future of a pushed job, its result is what exec() returned
+
+    exec_time is the time spent in exec(), total_time the time from push_job until the result was
+    available, the difference being queueing and transport
+    """
+
+    def __init__(self):
+        Future.__init__(self)
+        self.__push_time = time.perf_counter()
+        self.__exec_time = 0.0
+        self.__total_time = 0.0
+
+    @property
+    def exec_time(self):
+        return self.__exec_time
+
+    @property
+    def total_time(self):
+        return self.__total_time
+
+    def finish(self, result, exec_time, error=None):
+        self.__exec_time = exec_time
+        self.__total_time = time.perf_counter() - self.__push_time
+        if error is not None:
+            self.set_exception(error)
+        else:
+            self.set_result(result)
+
+
 class ParallelJobSys:
+    """run jobs, objects with an exec() method, on a pool of worker threads or worker processes
+
+    push_job(job) returns a JobFuture, wait(futures) blocks until all of them are done, the workers
+    (os.cpu_count() unless worker_count is given) pull jobs from one queue in push order
+
+    with JOB_BACKEND_PROCESS a worker gets a pickled copy of the job, arrays inside blocks from
+    alloc_shared/share travel as references to the block, so the worker sees the same memory and
+    exec() can hand back large results by writing into them
+    """
+
     class ParallelThread(Thread):
         def __init__(self, job_queue):
             Thread.__init__(self)
@@ -614,35 +687,199 @@ class ParallelJobSys:
         # override
         def run(self):
             while True:
-                job = self.__job_queue.get()
-                if job is None:
+                item = self.__job_queue.get()
+                if item is None:
                     self.__job_queue.task_done()
                     break
                 else:
-                    job.exec()
+                    job, future = item
+                    if not future.set_running_or_notify_cancel():
+                        self.__job_queue.task_done()
+                        continue
+
+                    start_time = time.perf_counter()
+                    try:
+                        result = job.exec()
+                        future.finish(result, time.perf_counter() - start_time)
+                    except Exception as e:
+                        future.finish(None, time.perf_counter() - start_time, e)
                     self.__job_queue.task_done()
 
-    def __init__(self):
-        self.__job_queue = Queue()
+    class ResultThread(Thread):
+        # hands the results of the worker processes to their futures
+        def __init__(self, result_queue, pending):
+            Thread.__init__(self, daemon=True)
+            self.__result_queue = result_queue
+            self.__pending = pending
+
+        # override
+        def run(self):
+            while True:
+                item = self.__result_queue.get()
+                if item is None:
+                    break
+
+                job_id, result, error, exec_time = item
+                future = self.__pending.pop(job_id, None)
+                if future and future.set_running_or_notify_cancel():
+                    future.finish(result, exec_time, Exception(error) if error else None)
+
+    class SharedArrayPickler(pickle.Pickler):
+        def __init__(self, file, shared_blocks):
+            pickle.Pickler.__init__(self, file, pickle.HIGHEST_PROTOCOL)
+            self.__shared_blocks = shared_blocks
+
+        # override
+        def reducer_override(self, obj):
+            if isinstance(obj, np.ndarray) and obj.size > 0:
+                address = obj.__array_interface__['data'][0]
+                for name, (_, start, size) in self.__shared_blocks.items():
+                    if start <= address < start + size:
+                        return attach_shared_array, (name, address - start, obj.shape, obj.strides, obj.dtype)
+            return NotImplemented
+
+    def __init__(self, backend=None, worker_count=None):
+        self.__backend = backend if backend else JOB_BACKEND_THREAD
+        self.__worker_count = worker_count if worker_count else (os.cpu_count() or 4)
         self.__thread_pool = []
+        self.__process_pool = []
+        self.__shared_blocks = {}   # name -> (SharedMemory, start address, size)
+        self.__retired_blocks = []  # unlinked, closed once no array uses them anymore
+
+        if self.__backend == JOB_BACKEND_PROCESS:
+            ctx = multiprocessing.get_context('spawn')  # no fork of the gui process
+            self.__job_queue = ctx.Queue()
+            self.__result_queue = ctx.Queue()
+            self.__pending = {}
+            self.__next_job_id = 0
+
+            for i in range(0, self.__worker_count):
+                proc = ctx.Process(target=run_job_process, args=(self.__job_queue, self.__result_queue),
+                                   daemon=True)
+                self.__process_pool.append(proc)
+                proc.start()
+
+            self.__result_thread = ParallelJobSys.ResultThread(self.__result_queue, self.__pending)
+            self.__result_thread.start()
+        else:
+            self.__job_queue = Queue()
+
+            for i in range(0, self.__worker_count):
+                trd = ParallelJobSys.ParallelThread(self.__job_queue)
+                self.__thread_pool.append(trd)
+                trd.start()
+
+    @property
+    def backend(self):
+        return self.__backend
 
-        for i in range(0, 4):
-            trd = ParallelJobSys.ParallelThread(self.__job_queue)
-            self.__thread_pool.append(trd)
-            trd.start()
+    @property
+    def worker_count(self):
+        return self.__worker_count
 
     def quit(self):
-        trd_sz = len(self.__thread_pool)
-        for i in range(0, trd_sz):
-            self.push_job(None)
+        for i in range(0, len(self.__thread_pool) + len(self.__process_pool)):
+            self.__job_queue.put(None)
 
         for trd in self.__thread_pool:
             trd.join()
-
         self.__thread_pool.clear()
 
+        if self.__process_pool:
+            for proc in self.__process_pool:
+                proc.join()
+            self.__process_pool.clear()
+
+            self.__result_queue.put(None)
+            self.__result_thread.join()
+
+        for name in list(self.__shared_blocks):
+            self.__retire_block(name)
+        self.__close_retired_blocks()
+
     def push_job(self, job):
-        self.__job_queue.put(job)
+        future = JobFuture()
+        if self.__process_pool:
+            job_id = self.__next_job_id
+            self.__next_job_id += 1
+            self.__pending[job_id] = future
+
+            buf = io.BytesIO()
+            ParallelJobSys.SharedArrayPickler(buf, self.__shared_blocks).dump(job)
+            self.__job_queue.put((job_id, buf.getvalue()))
+        else:
+            self.__job_queue.put((job, future))
+        return future
+
+    def cancel_pending(self):
+        """cancel the jobs no worker has started yet, the running ones still finish"""
+        while True:
+            try:
+                item = self.__job_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if self.__process_pool:
+                future = self.__pending.pop(item[0], None)
+            else:
+                future = item[1]
+                self.__job_queue.task_done()
+            if future and future.cancel():
+                future.set_running_or_notify_cancel()   # done for wait, no worker will run it
+
+    @staticmethod
+    def wait(futures, timeout=None):
+        """block until all futures are done, return False on timeout"""
+        _, not_done = concurrent.futures.wait(futures, timeout)
+        return len(not_done) == 0
+
+    def alloc_shared(self, shape, dtype):
+        """an uninitialized array that jobs on any backend can read and write"""
+        if self.__backend != JOB_BACKEND_PROCESS:
+            return np.empty(shape, dtype)
+
+        self.__close_retired_blocks()
+
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        shm = SharedMemory(create=True, size=max(1, count * dtype.itemsize))
+        data = np.frombuffer(shm.buf, np.uint8)
+        self.__shared_blocks[shm.name] = (shm, data.__array_interface__['data'][0], shm.size)
+        return np.frombuffer(shm.buf, dtype, count).reshape(shape)
+
+    def share(self, array):
+        """array itself, or a copy of it in shared memory for the process backend"""
+        if self.__backend != JOB_BACKEND_PROCESS:
+            return array
+
+        shared = self.alloc_shared(array.shape, array.dtype)
+        shared[...] = array
+        return shared
+
+    def release_shared(self, array):
+        """give back the block of an array from alloc_shared/share, the array must not be used anymore"""
+        if self.__backend != JOB_BACKEND_PROCESS:
+            return
+
+        address = array.__array_interface__['data'][0]
+        for name, (_, start, size) in list(self.__shared_blocks.items()):
+            if start <= address < start + size:
+                self.__retire_block(name)
+        self.__close_retired_blocks()
+
+    def __retire_block(self, name):
+        shm = self.__shared_blocks.pop(name)[0]
+        shm.unlink()
+        self.__retired_blocks.append(shm)
+
+    def __close_retired_blocks(self):
+        still_used = []
+        for shm in self.__retired_blocks:
+            try:
+                shm.close()
+            except BufferError:
+                still_used.append(shm)  # some array still points into the block
+        self.__retired_blocks = still_used
 
 
 # ------------------------------------------------------------------------------#
@@ -653,3 +890,9 @@ g_font_tuple = ('SimSun', 10)
 
 PROJ_MODE_PERSPECTIVE = "Perspective"
 PROJ_MODE_ORTHOGRAPHIC = "Orthographic"
+
+JOB_BACKEND_THREAD = "Thread"
+JOB_BACKEND_PROCESS = "Process"
+
+PRESENT_MODE_VECTOR = "Vector"
+PRESENT_MODE_RASTER = "Raster"
@@ -0,0 +1,171 @@
+"""@ package docstring
+Bounding volume hierarchy over the edges of a model
+
+the edges are sorted along a morton curve through their mid points, so every node of the tree covers a
+contiguous range of them, a leaf holds LEAF_EDGES edges and each level above merges pairs of nodes
+"""
+
+import numpy as np
+
+from common import WireframeModel
+
+
+LEAF_EDGES = 1024
+
+# bits per axis of the morton key
+MORTON_BITS = 10
+
+
+# -----------------------------------------------------------------------------#
+# EdgeBvh
+# -----------------------------------------------------------------------------#
+
+
+def spread_bits(v):
+    """put the low MORTON_BITS bits of v two bits apart"""
+    v = v.astype(np.uint32) & 0x3ff
+    v = (v | (v << 16)) & 0x030000ff
+    v = (v | (v << 8)) & 0x0300f00f
+    v = (v | (v << 4)) & 0x030c30c3
+    v = (v | (v << 2)) & 0x09249249
+    return v
+
+
+def morton_order(points, box_min, box_max):
+    """the order of points along a morton curve over the box"""
+    cells = (1 << MORTON_BITS) - 1
+    scale = cells / np.maximum(box_max - box_min, 1e-30)
+    q = np.clip((points - box_min) * scale, 0, cells)
+    keys = spread_bits(q[:, 0]) | (spread_bits(q[:, 1]) << 1) | (spread_bits(q[:, 2]) << 2)
+    return np.argsort(keys, kind='stable')
+
+
+class EdgeBvh:
+    def __init__(self, edge_count, level_mins, level_maxs):
+        self.__edge_count = edge_count
+        self.__level_mins = level_mins      # [(nodes, 3)], leaves first
+        self.__level_maxs = level_maxs
+
+    @property
+    def edge_count(self):
+        return self.__edge_count
+
+    @property
+    def leaf_mins(self):
+        """(leaves, 3) lower corners of the leaf boxes"""
+        return self.__level_mins[0] if self.__level_mins else np.zeros((0, 3), np.float64)
+
+    @property
+    def leaf_maxs(self):
+        return self.__level_maxs[0] if self.__level_maxs else np.zeros((0, 3), np.float64)
+
+    @staticmethod
+    def build(vertices, edges):
+        """(EdgeBvh, edges sorted into the order of its leaves)"""
+        vertices = np.asarray(vertices)
+        edges = np.asarray(edges)
+        if len(edges) == 0:
+            return EdgeBvh(0, [], []), edges
+
+        mid_pts = (vertices[edges[:, 0]].astype(np.float64) + vertices[edges[:, 1]]) * 0.5
+        order = morton_order(mid_pts, mid_pts.min(axis=0), mid_pts.max(axis=0))
+        edges = np.ascontiguousarray(edges[order])
+
+        # leaf boxes from both end points of the edges of each leaf
+        leaf_starts = np.arange(0, len(edges), LEAF_EDGES)
+        leaf_mins = np.empty((len(leaf_starts), 3), np.float64)
+        leaf_maxs = np.empty((len(leaf_starts), 3), np.float64)
+        for start in range(0, len(leaf_starts), 256):
+            # a few hundred leaves at a time bounds the gathered end points
+            stop = min(start + 256, len(leaf_starts))
+            first_edge = leaf_starts[start]
+            last_edge = min(leaf_starts[stop - 1] + LEAF_EDGES, len(edges))
+            pts = vertices[edges[first_edge:last_edge]]
+            lo = np.minimum(pts[:, 0], pts[:, 1])
+            hi = np.maximum(pts[:, 0], pts[:, 1])
+            leaf_mins[start:stop] = np.minimum.reduceat(lo, leaf_starts[start:stop] - first_edge)
+            leaf_maxs[start:stop] = np.maximum.reduceat(hi, leaf_starts[start:stop] - first_edge)
+
+        return EdgeBvh.from_leaves(len(edges), leaf_mins, leaf_maxs), edges
+
+    @staticmethod
+    def from_leaves(edge_count, leaf_mins, leaf_maxs):
+        """EdgeBvh of edges already in leaf order, from the boxes of its leaves, e.g. kept in a cache"""
+        if edge_count == 0:
+            return EdgeBvh(0, [], [])
+
+        level_mins = [np.asarray(leaf_mins, np.float64)]
+        level_maxs = [np.asarray(leaf_maxs, np.float64)]
+        while len(level_mins[-1]) > 1:
+            mins = level_mins[-1]
+            maxs = level_maxs[-1]
+            pairs = np.arange(0, len(mins), 2)
+            level_mins.append(np.minimum.reduceat(mins, pairs))
+            level_maxs.append(np.maximum.reduceat(maxs, pairs))
+
+        return EdgeBvh(edge_count, level_mins, level_maxs)
+
+    def visible_ranges(self, planes):
+        """(R, 2) array of the start and stop of the edge ranges that may be visible, in increasing order
+
+        planes: (P, 4) in model space, a point p is inside when dot(plane, (p, 1.0)) >= 0.0
+        """
+        if self.__edge_count == 0:
+            return np.zeros((0, 2), np.int64)
+
+        normals = planes[:, :3]
+        abs_normals = np.abs(normals)
+        leaf_count = len(self.__level_mins[0])
+
+        first_leaves = []
+        stop_leaves = []
+
+        level = len(self.__level_mins) - 1
+        nodes = np.arange(len(self.__level_mins[level]))
+        while len(nodes) > 0:
+            # distance of the box center to each plane, against the reach of the box along the normal
+            mins = self.__level_mins[level][nodes]
+            maxs = self.__level_maxs[level][nodes]
+            dist = (mins + maxs) * 0.5 @ normals.T + planes[:, 3]
+            reach = (maxs - mins) * 0.5 @ abs_normals.T
+
+            outside = (dist + reach < 0.0).any(axis=1)
+            inside = (dist - reach >= 0.0).all(axis=1)
+
+            keep = ~outside if level == 0 else inside
+            first_leaves.append(nodes[keep] << level)
+            stop_leaves.append(np.minimum((nodes[keep] + 1) << level, leaf_count))
+
+            if level == 0:
+                break
+
+            crossing = nodes[~outside & ~inside]
+            children = np.stack([crossing * 2, crossing * 2 + 1], axis=1).ravel()
+            level -= 1
+            nodes = children[children < len(self.__level_mins[level])]
+
+        first_leaves = np.concatenate(first_leaves)
+        stop_leaves = np.concatenate(stop_leaves)
+        if len(first_leaves) == 0:
+            return np.zeros((0, 2), np.int64)
+
+        order = np.argsort(first_leaves)
+        first_leaves = first_leaves[order]
+        stop_leaves = stop_leaves[order]
+
+        # merge touching ranges
+        is_new = np.empty(len(first_leaves), bool)
+        is_new[:1] = True
+        np.not_equal(first_leaves[1:], stop_leaves[:-1], out=is_new[1:])
+        starts = first_leaves[is_new]
+        stops = stop_leaves[np.append(np.flatnonzero(is_new)[1:], len(is_new)) - 1]
+
+        ranges = np.empty((len(starts), 2), np.int64)
+        ranges[:, 0] = starts * LEAF_EDGES
+        ranges[:, 1] = np.minimum(stops * LEAF_EDGES, self.__edge_count)
+        return ranges
+
+
+def build_edge_bvh(model: WireframeModel):
+    """give model a bvh, its edges are replaced by the same edges in the order of the bvh"""
+    model.bvh, model.edges = EdgeBvh.build(model.vertices, model.edges)
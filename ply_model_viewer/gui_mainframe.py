@@ -5,6 +5,8 @@ Main window
 import os
 import configparser
 
+import numpy as np
+
 from tkinter import *
 from tkinter import filedialog as fd
 from tkinter import messagebox as mb
@@ -19,6 +21,11 @@ from gui_toolbar import GUIToolBar
 from gui_status_bar import GUIStatusBar
 from gui_settings_dlg import *
 from model_viewer import *
+from model_cache import ModelCache
+from renderer import rasterize_lines
+
+
+LOAD_POLL_INTERVAL_MS = 50
 
 
 # -----------------------------------------------------------------------------#
@@ -30,19 +37,135 @@ class GUIMainframe(Tk):
 
     # inner class, implement CanvasIntf interface
     class GUICanvas(common.CanvasIntf):
+
+        # a frame is handed to tcl as one list of coordinates, the line items of the last frame are kept and
+        # moved with coords, items are only created or deleted when the number of lines changes
+        PRESENT_LINES_PROC = '''
+proc ply_viewer_present_lines {canvas coords color} {
+    global ply_viewer_items ply_viewer_color
+    if {![info exists ply_viewer_items($canvas)]} {
+        set ply_viewer_items($canvas) {}
+        set ply_viewer_color($canvas) $color
+    }
+    set items $ply_viewer_items($canvas)
+    set item_count [llength $items]
+    set line_count [expr {[llength $coords] / 4}]
+
+    if {$ply_viewer_color($canvas) ne $color} {
+        foreach id $items {
+            $canvas itemconfigure $id -fill $color
+        }
+        set ply_viewer_color($canvas) $color
+    }
+
+    set reused [expr {min($item_count, $line_count)}]
+    foreach id [lrange $items 0 [expr {$reused - 1}]] {x1 y1 x2 y2} [lrange $coords 0 [expr {$reused * 4 - 1}]] {
+        $canvas coords $id $x1 $y1 $x2 $y2
+    }
+
+    if {$line_count > $item_count} {
+        foreach {x1 y1 x2 y2} [lrange $coords [expr {$reused * 4}] end] {
+            lappend items [$canvas create line $x1 $y1 $x2 $y2 -fill $color]
+        }
+    } elseif {$line_count < $item_count} {
+        $canvas delete {*}[lrange $items $line_count end]
+        set items [lrange $items 0 [expr {$line_count - 1}]]
+    }
+    set ply_viewer_items($canvas) $items
+}
+'''
+
         def __init__(self, owner, tk_canvas):
             common.CanvasIntf.__init__(self)
             self.__owner = owner
             self.__tk_canvas = tk_canvas
+            self.__frame_lines = []     # (N, 4) arrays drawn since clear
+            self.__tk_canvas.tk.eval(GUIMainframe.GUICanvas.PRESENT_LINES_PROC)
 
         # override
         def clear(self):
-            self.__tk_canvas.delete('all')
+            self.__frame_lines = []
 
         # override
         def draw_line(self, vec2_pt1, vec2_pt2):
-            view_points = [vec2_pt1.x, vec2_pt1.y, vec2_pt2.x, vec2_pt2.y]
-            self.__tk_canvas.create_line(view_points, fill=self.__owner.cfg_fg_color)
+            self.__frame_lines.append([[vec2_pt1.x, vec2_pt1.y, vec2_pt2.x, vec2_pt2.y]])
+
+        # override
+        def draw_lines(self, lines):
+            self.__frame_lines.append(lines)
+
+        # override
+        def present(self):
+            if self.__frame_lines:
+                lines = np.concatenate(self.__frame_lines)
+            else:
+                lines = np.empty((0, 4))
+            self.__frame_lines = []
+
+            # lines are drawn on whole pixels anyway, integers are quicker to format and for tcl to parse
+            coords = ' '.join(map(str, np.rint(lines).astype(np.int32).ravel().tolist()))
+            self.__tk_canvas.tk.call('ply_viewer_present_lines', self.__tk_canvas._w, coords,
+                                     self.__owner.cfg_fg_color)
+
+        def release(self):
+            # remove the line items, before another canvas takes over the view
+            self.clear()
+            self.present()
+
+    # inner class, implement CanvasIntf interface, a frame is rasterized into an image and shown as one item
+    class GUIRasterCanvas(common.CanvasIntf):
+        def __init__(self, owner, tk_canvas):
+            common.CanvasIntf.__init__(self)
+            self.__owner = owner
+            self.__tk_canvas = tk_canvas
+            self.__frame_lines = []     # (N, 4) arrays drawn since clear
+            self.__photo = None         # sized to the canvas, pasted into every frame
+            self.__image_item = None
+
+        # override
+        def clear(self):
+            self.__frame_lines = []
+
+        # override
+        def draw_line(self, vec2_pt1, vec2_pt2):
+            self.__frame_lines.append([[vec2_pt1.x, vec2_pt1.y, vec2_pt2.x, vec2_pt2.y]])
+
+        # override
+        def draw_lines(self, lines):
+            self.__frame_lines.append(lines)
+
+        # override
+        def present(self):
+            w = self.__tk_canvas.winfo_width()
+            h = self.__tk_canvas.winfo_height()
+
+            mask = np.zeros((h, w), np.bool_)
+            if self.__frame_lines:
+                rasterize_lines(np.concatenate(self.__frame_lines), mask)
+            self.__frame_lines = []
+
+            palette = np.array([self.__rgb(self.__owner.cfg_bg_color), self.__rgb(self.__owner.cfg_fg_color)],
+                               np.uint8)
+            image = PIL.Image.fromarray(palette[mask.view(np.uint8)], 'RGB')
+
+            if self.__photo is None or self.__photo.width() != w or self.__photo.height() != h:
+                self.__photo = PIL.ImageTk.PhotoImage(image)
+                if self.__image_item is None:
+                    self.__image_item = self.__tk_canvas.create_image(0, 0, anchor=NW, image=self.__photo)
+                else:
+                    self.__tk_canvas.itemconfigure(self.__image_item, image=self.__photo)
+            else:
+                self.__photo.paste(image)
+
+        def release(self):
+            # remove the image item, before another canvas takes over the view
+            if self.__image_item is not None:
+                self.__tk_canvas.delete(self.__image_item)
+            self.__image_item = None
+            self.__photo = None
+
+        def __rgb(self, color):
+            return [c >> 8 for c in self.__tk_canvas.winfo_rgb(color)]
 
     def __init__(self):
         Tk.__init__(self)
@@ -57,6 +180,12 @@ class GUIMainframe(Tk):
         self.cfg_bg_color = 'white'
         self.cfg_fg_color = 'black'
         self.cfg_proj_mode = common.PROJ_MODE_PERSPECTIVE
+        self.cfg_mmap_ply = False
+        self.cfg_cache_dir = './cache'
+        self.cfg_cache_size_mb = 1024
+        self.cfg_job_backend = common.JOB_BACKEND_THREAD
+        self.cfg_job_workers = 0    # 0: one per cpu
+        self.cfg_present_mode = common.PRESENT_MODE_VECTOR
         self.__load_config()
 
         self.title('PLY Model View')
@@ -64,6 +193,7 @@ class GUIMainframe(Tk):
         img = Image('photo', file='res/app.png')
         self.tk.call('wm', 'iconphoto', self._w, img)
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.bind('<Escape>', self.__on_escape_key)
 
         # init window size
 
@@ -89,11 +219,21 @@ class GUIMainframe(Tk):
         self.__status_bar = GUIStatusBar(self)
         self.__gui_view = GUIView(self)
 
-        canvas_impl = GUIMainframe.GUICanvas(self, self.__gui_view)
-        self.__model_viewer = ModelViewer(canvas_impl, self.cfg_fovy, self.cfg_proj_mode,
-                                          self.__gui_view.winfo_width(), self.__gui_view.winfo_height())
+        self.__present_mode = self.cfg_present_mode
+        self.__canvas_impl = self.__create_canvas(self.__present_mode)
+        model_cache = ModelCache(self.cfg_cache_dir, self.cfg_cache_size_mb * 1024 * 1024)
+        self.__model_viewer = ModelViewer(self.__canvas_impl, self.cfg_fovy, self.cfg_proj_mode,
+                                          self.__gui_view.winfo_width(), self.__gui_view.winfo_height(),
+                                          model_cache, self.cfg_job_backend, self.cfg_job_workers)
+        self.__model_viewer.set_draw_scheduler(self.after_idle, self.after)
 
         self.__settings_dlg = None
+        self.__loader = None
+
+    def __create_canvas(self, present_mode):
+        if present_mode == common.PRESENT_MODE_RASTER:
+            return GUIMainframe.GUIRasterCanvas(self, self.__gui_view)
+        return GUIMainframe.GUICanvas(self, self.__gui_view)
 
     def __load_config(self):
         config = configparser.ConfigParser()
@@ -107,6 +247,12 @@ class GUIMainframe(Tk):
             self.cfg_bg_color = config.get('config', 'bg_color', fallback=self.cfg_bg_color)
             self.cfg_fg_color = config.get('config', 'fg_color', fallback=self.cfg_fg_color)
             self.cfg_proj_mode = config.get('config', 'proj_mode', fallback=self.cfg_proj_mode)
+            self.cfg_mmap_ply = config.getboolean('config', 'mmap_ply', fallback=self.cfg_mmap_ply)
+            self.cfg_cache_dir = config.get('config', 'cache_dir', fallback=self.cfg_cache_dir)
+            self.cfg_cache_size_mb = config.getint('config', 'cache_size_mb', fallback=self.cfg_cache_size_mb)
+            self.cfg_job_backend = config.get('config', 'job_backend', fallback=self.cfg_job_backend)
+            self.cfg_job_workers = config.getint('config', 'job_workers', fallback=self.cfg_job_workers)
+            self.cfg_present_mode = config.get('config', 'present_mode', fallback=self.cfg_present_mode)
 
         except Exception as e:
             print(f'__load_config error: {e}\n')
@@ -123,6 +269,12 @@ class GUIMainframe(Tk):
             config['config']['bg_color'] = self.cfg_bg_color
             config['config']['fg_color'] = self.cfg_fg_color
             config['config']['proj_mode'] = self.cfg_proj_mode
+            config['config']['mmap_ply'] = str(self.cfg_mmap_ply)
+            config['config']['cache_dir'] = self.cfg_cache_dir
+            config['config']['cache_size_mb'] = str(self.cfg_cache_size_mb)
+            config['config']['job_backend'] = self.cfg_job_backend
+            config['config']['job_workers'] = str(self.cfg_job_workers)
+            config['config']['present_mode'] = self.cfg_present_mode
 
             with open('./cfg.ini', 'w') as configfile:
                 config.write(configfile)
@@ -133,7 +285,14 @@ class GUIMainframe(Tk):
             self.__gui_view.configure(bg=self.cfg_bg_color)
             self.__model_viewer.set_fovy(self.cfg_fovy)
             self.__model_viewer.set_proj_mode(self.cfg_proj_mode)
-            self.__model_viewer.draw()
+
+            if self.cfg_present_mode != self.__present_mode:
+                self.__canvas_impl.release()
+                self.__present_mode = self.cfg_present_mode
+                self.__canvas_impl = self.__create_canvas(self.__present_mode)
+                self.__model_viewer.set_canvas_intf(self.__canvas_impl)
+
+            self.__model_viewer.invalidate()    # the colors may have changed
 
         except Exception as e:
             print(f'save_config error: {e}')
@@ -165,16 +324,61 @@ class GUIMainframe(Tk):
                     self.cfg_open_folder = folder
                     self.save_config()
 
-                self.__model_viewer.load_model(path)
-                self.__status_bar.set_infor(path)
+                self.__start_loading(path)
 
         except Exception as e:
             print(f'open_model error: {e}\n')
 
+    def __start_loading(self, path):
+        self.cancel_loading()
+
+        # parse on a worker thread, the model is swapped in by __poll_loading once it is complete
+        self.__loader = self.__model_viewer.create_loader(path, self.cfg_mmap_ply)
+        self.__loader.start()
+        self.__status_bar.set_infor(f'loading {path}')
+        self.__status_bar.show_cancel(self.cancel_loading)
+        self.after(LOAD_POLL_INTERVAL_MS, self.__poll_loading, self.__loader)
+
+    def __poll_loading(self, loader):
+        if loader is not self.__loader:
+            return  # cancelled
+
+        if loader.is_alive():
+            if loader.total_bytes > 0:
+                mib = 1024.0 * 1024.0
+                self.__status_bar.set_infor(
+                    f'loading {loader.filename}  {loader.stage} '
+                    f'{loader.done_bytes * 100 // loader.total_bytes}% '
+                    f'({loader.done_bytes / mib:.1f} / {loader.total_bytes / mib:.1f} MB)')
+            self.after(LOAD_POLL_INTERVAL_MS, self.__poll_loading, loader)
+            return
+
+        self.__loader = None
+        self.__status_bar.hide_cancel()
+
+        if loader.model is not None:
+            self.__model_viewer.set_model(loader.model, loader.filename)
+            self.__status_bar.set_infor(loader.filename)
+        else:
+            if loader.error is not None:
+                print(f'open_model error: {loader.error}\n')
+            self.__status_bar.set_infor('')
+
+    def cancel_loading(self):
+        if self.__loader:
+            self.__loader.cancel()
+            self.__loader = None
+            self.__status_bar.hide_cancel()
+            self.__status_bar.set_infor('')
+
+    def __on_escape_key(self, event):
+        self.cancel_loading()
+
     def load_test_cube(self):
         self.__model_viewer.load_test_cube()
 
     def clear_model(self):
+        self.cancel_loading()
         self.__model_viewer.clear_model()
         self.__status_bar.set_infor('')
 
@@ -184,6 +388,7 @@ class GUIMainframe(Tk):
             self.wait_window(self.__settings_dlg)
 
     def on_closing(self):
+        self.cancel_loading()
         self.__model_viewer.quit()
         self.destroy()
 
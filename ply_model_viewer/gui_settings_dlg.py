@@ -34,6 +34,16 @@ class GUISettingsDialog(Toplevel):
         self.__cbx_proj_mode.set(self.__main_frame.cfg_proj_mode)
         self.__cbx_proj_mode.grid(row=row, column=1, padx=1, pady=1, sticky=W)
 
+        row += 1
+        lbl_present_mode = Label(self, text='Presentation Mode', font=common.g_font_tuple, anchor=E)
+        lbl_present_mode.grid(row=row, column=0, padx=1, pady=1, sticky=W)
+
+        self.__cbx_present_mode = ttk.Combobox(self, width=16, font=common.g_font_tuple)
+        self.__cbx_present_mode['values'] = (common.PRESENT_MODE_VECTOR, common.PRESENT_MODE_RASTER)
+        self.__cbx_present_mode['state'] = 'readonly'
+        self.__cbx_present_mode.set(self.__main_frame.cfg_present_mode)
+        self.__cbx_present_mode.grid(row=row, column=1, padx=1, pady=1, sticky=W)
+
         row += 1
         lbl_fov_y = Label(self, text='Field of View (Y)', font=common.g_font_tuple, anchor=E)
         lbl_fov_y.grid(row=row, column=0, padx=1, pady=1, sticky=W)
@@ -63,7 +73,7 @@ class GUISettingsDialog(Toplevel):
         self.btn_ok.grid(row=row, column=1, sticky=E)
 
         dlg_w = 300
-        dlg_h = 200
+        dlg_h = 225
 
         # center display
         scn_w, scn_h = self.maxsize()
@@ -88,6 +98,7 @@ class GUISettingsDialog(Toplevel):
     def on_ok(self):
         try:
             self.__main_frame.cfg_proj_mode = self.__cbx_proj_mode.get()
+            self.__main_frame.cfg_present_mode = self.__cbx_present_mode.get()
             self.__main_frame.cfg_fovy = float(self.__edt_fov_y.get())
             self.__main_frame.cfg_bg_color = self.__pan_background_color['background']
             self.__main_frame.cfg_fg_color = self.__pan_foreground_color['background']
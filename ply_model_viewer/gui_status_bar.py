@@ -1,11 +1,12 @@
 """@ package docstring
 Status Bar
 
-display the filename of the current ply file
+display the filename of the current ply file, or the progress while it is loading
 """
 
 
 from tkinter import *
+import common
 
 
 # -----------------------------------------------------------------------------#
@@ -21,5 +22,14 @@ class GUIStatusBar(Frame):
         self.lab_infor = Label(self, text="")
         self.lab_infor.pack(side=LEFT)
 
+        self.btn_cancel = Button(self, text='Cancel', font=common.g_font_tuple, relief=FLAT)
+
     def set_infor(self, s):
         self.lab_infor.config(text=s)
+
+    def show_cancel(self, command):
+        self.btn_cancel.config(command=command)
+        self.btn_cancel.pack(side=RIGHT)
+
+    def hide_cancel(self):
+        self.btn_cancel.pack_forget()
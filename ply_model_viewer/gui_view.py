@@ -41,6 +41,7 @@ class GUIView(Canvas):
 
     def __on_canvas_left_button_down(self, event):
         self.__left_button_down = True
+        self.__main_frame.model_viewer.begin_interaction()
         self.__cursor_prior_x = event.x
         self.__cursor_prior_y = event.y
 
@@ -49,17 +50,22 @@ class GUIView(Canvas):
 
     def __on_canvas_right_button_down(self, event):
         self.__right_button_down = True
+        self.__main_frame.model_viewer.begin_interaction()
         self.__cursor_prior_x = event.x
         self.__cursor_prior_y = event.y
 
     def __on_canvas_left_button_up(self, event):
         self.__left_button_down = False
+        if not self.__right_button_down:
+            self.__main_frame.model_viewer.end_interaction()
 
     def __on_canvas_middle_button_up(self, event):
         pass
 
     def __on_canvas_right_button_up(self, event):
         self.__right_button_down = False
+        if not self.__left_button_down:
+            self.__main_frame.model_viewer.end_interaction()
 
     def __on_canvas_mouse_move(self, event):
         if self.__left_button_down or self.__right_button_down:
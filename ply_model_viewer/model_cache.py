@@ -0,0 +1,234 @@
+"""@ package docstring
+On-disk cache of parsed models
+
+an entry keeps the vertex array, the edge index array in bvh order, the leaf boxes of the bvh, the bounding
+box and the property columns of a ply file in a raw binary layout, it is found by the path, size and mtime
+of the source file, so a column that was never read can stay a reference to where it is in the source file
+"""
+
+import os
+import hashlib
+from threading import Lock
+
+import numpy as np
+
+from common import Vec3, WireframeModel
+from edge_bvh import EdgeBvh
+from ply_file import PlyColumn
+
+
+# -----------------------------------------------------------------------------#
+# ModelCache
+# -----------------------------------------------------------------------------#
+
+
+class ModelCache:
+
+    ENTRY_EXT = '.mdl'
+    ENTRY_VERSION = 5
+
+    HEADER_DTYPE = np.dtype([('magic', 'S4'),
+                             ('version', '<u4'),
+                             ('vertex_count', '<u8'),
+                             ('vertex_dtype', 'S8'),    # '<f4', or '<f8' for double coordinates
+                             ('edge_count', '<u8'),
+                             ('leaf_count', '<u8'),     # 0 without a bvh
+                             ('column_count', '<u8'),
+                             ('model_min', '<f8', (3,)),
+                             ('model_max', '<f8', (3,))])
+
+    EDGE_DTYPE = np.dtype('<i4')
+    BOX_DTYPE = np.dtype('<f8')
+
+    # the values of the columns follow the table in its order, an element without columns has a record
+    # with an empty name, a column with a source_stride is read from the source file instead, its values
+    # are source_stride bytes apart from source_offset on
+    COLUMN_DTYPE = np.dtype([('element', 'S64'),
+                             ('name', 'S64'),
+                             ('dtype', 'S8'),           # as declared in the ply header
+                             ('values_dtype', 'S8'),
+                             ('count', '<u8'),
+                             ('source_offset', '<u8'),
+                             ('source_stride', '<u8')])
+
+    def __init__(self, cache_dir, max_bytes):
+        self.__cache_dir = cache_dir
+        self.__max_bytes = max_bytes
+        self.__store_lock = Lock()     # models are stored on threads of their own
+
+    def load(self, filename, use_mmap=False):
+        """return the cached model of filename, or None if there is no entry for its current version"""
+        entry_path = self.__entry_path(filename)
+        if not entry_path or not os.path.isfile(entry_path):
+            return None
+
+        try:
+            with open(entry_path, 'rb') as f:
+                header = np.fromfile(f, ModelCache.HEADER_DTYPE, 1)
+                if len(header) != 1 or header['magic'][0] != b'PLYC' or \
+                        header['version'][0] != ModelCache.ENTRY_VERSION:
+                    raise Exception('bad entry header')
+
+                vertex_count = int(header['vertex_count'][0])
+                vertex_dtype = np.dtype(header['vertex_dtype'][0].decode('ascii'))
+                edge_count = int(header['edge_count'][0])
+                leaf_count = int(header['leaf_count'][0])
+                vertex_offset = ModelCache.HEADER_DTYPE.itemsize
+                edge_offset = vertex_offset + vertex_count * 3 * vertex_dtype.itemsize
+                box_offset = edge_offset + edge_count * 2 * ModelCache.EDGE_DTYPE.itemsize
+
+                if use_mmap and vertex_count > 0 and edge_count > 0:
+                    vertices = np.memmap(entry_path, vertex_dtype, 'r', vertex_offset, (vertex_count, 3))
+                    edges = np.memmap(entry_path, ModelCache.EDGE_DTYPE, 'r', edge_offset, (edge_count, 2))
+                else:
+                    vertices = np.fromfile(f, vertex_dtype, vertex_count * 3).reshape(vertex_count, 3)
+                    edges = np.fromfile(f, ModelCache.EDGE_DTYPE, edge_count * 2).reshape(edge_count, 2)
+
+                f.seek(box_offset)
+                leaf_mins = np.fromfile(f, ModelCache.BOX_DTYPE, leaf_count * 3).reshape(leaf_count, 3)
+                leaf_maxs = np.fromfile(f, ModelCache.BOX_DTYPE, leaf_count * 3).reshape(leaf_count, 3)
+
+                column_table = np.fromfile(f, ModelCache.COLUMN_DTYPE, int(header['column_count'][0]))
+                properties = {}
+                column_offset = f.tell()
+                for record in column_table:
+                    columns = properties.setdefault(record['element'].decode('utf-8'), {})
+                    name = record['name'].decode('utf-8')
+                    if not name:
+                        continue
+
+                    dtype = record['dtype'].decode('ascii')
+                    count = int(record['count'])
+                    source_stride = int(record['source_stride'])
+                    if source_stride > 0:
+                        row_dtype = np.dtype({'names': [name], 'formats': [dtype], 'offsets': [0],
+                                              'itemsize': source_stride})
+                        columns[name] = PlyColumn(name, dtype, count,
+                                                  source=(filename, int(record['source_offset']), row_dtype))
+                        continue
+
+                    values_dtype = np.dtype(record['values_dtype'].decode('ascii'))
+                    if use_mmap and count > 0:
+                        values = np.memmap(entry_path, values_dtype, 'r', column_offset, (count,))
+                    else:
+                        f.seek(column_offset)
+                        values = np.fromfile(f, values_dtype, count)
+                    columns[name] = PlyColumn(name, dtype, count, values=values)
+                    column_offset += count * values_dtype.itemsize
+
+            # mark as recently used for the eviction order
+            os.utime(entry_path)
+
+            model_min = header['model_min'][0].tolist()
+            model_max = header['model_max'][0].tolist()
+            model = WireframeModel(vertices, edges,
+                                   Vec3(model_min[0], model_min[1], model_min[2]),
+                                   Vec3(model_max[0], model_max[1], model_max[2]), properties)
+            if leaf_count > 0:
+                model.bvh = EdgeBvh.from_leaves(edge_count, leaf_mins, leaf_maxs)
+            return model
+
+        except Exception as e:
+            print(f'ModelCache.load error: {e}\n')
+            self.__remove(entry_path)   # parsed and stored again
+            return None
+
+    def store(self, filename, model: WireframeModel):
+        """write the entry of filename, unless there is one already, may run on any thread"""
+        with self.__store_lock:
+            entry_path = self.__entry_path(filename)
+            if entry_path and not os.path.isfile(entry_path):
+                self.__store(entry_path, filename, model)
+
+    def __store(self, entry_path, filename, model: WireframeModel):
+        try:
+            # columns of the source file are kept as references, whether they were read or not
+            column_table = []
+            column_values = []
+            for element, columns in model.properties.items():
+                if not columns:
+                    column_table.append((element.encode('utf-8'), b'', b'', b'', 0, 0, 0))
+                for name, column in columns.items():
+                    if column.source is not None and column.source[0] == filename:
+                        _, offset, row_dtype = column.source
+                        column_table.append((element.encode('utf-8'), name.encode('utf-8'),
+                                             column.dtype.str.encode('ascii'), b'', column.count,
+                                             offset + row_dtype.fields[name][1], row_dtype.itemsize))
+                        continue
+
+                    values = np.ascontiguousarray(column.values)
+                    column_table.append((element.encode('utf-8'), name.encode('utf-8'),
+                                         column.dtype.str.encode('ascii'), values.dtype.str.encode('ascii'),
+                                         len(values), 0, 0))
+                    column_values.append(values)
+            if any(len(record[0]) > 64 or len(record[1]) > 64 for record in column_table):
+                return  # names that do not fit into the table, such a file is parsed every time
+
+            os.makedirs(self.__cache_dir, exist_ok=True)
+
+            header = np.zeros(1, ModelCache.HEADER_DTYPE)
+            header['magic'] = b'PLYC'
+            header['version'] = ModelCache.ENTRY_VERSION
+            vertex_dtype = np.dtype(model.vertices.dtype).newbyteorder('<')
+            header['vertex_count'] = len(model.vertices)
+            header['vertex_dtype'] = vertex_dtype.str.encode('ascii')
+            header['edge_count'] = len(model.edges)
+            header['leaf_count'] = len(model.bvh.leaf_mins) if model.bvh else 0
+            header['column_count'] = len(column_table)
+            header['model_min'] = [model.model_min.x, model.model_min.y, model.model_min.z]
+            header['model_max'] = [model.model_max.x, model.model_max.y, model.model_max.z]
+
+            # write to a temporary name first, so a reader never sees a partial entry
+            tmp_path = entry_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                header.tofile(f)
+                np.ascontiguousarray(model.vertices, vertex_dtype).tofile(f)
+                np.ascontiguousarray(model.edges, ModelCache.EDGE_DTYPE).tofile(f)
+                if model.bvh:
+                    np.ascontiguousarray(model.bvh.leaf_mins, ModelCache.BOX_DTYPE).tofile(f)
+                    np.ascontiguousarray(model.bvh.leaf_maxs, ModelCache.BOX_DTYPE).tofile(f)
+                np.array(column_table, ModelCache.COLUMN_DTYPE).tofile(f)
+                for values in column_values:
+                    values.tofile(f)
+            os.replace(tmp_path, entry_path)
+
+            self.__evict()
+
+        except Exception as e:
+            print(f'ModelCache.store error: {e}\n')
+
+    def __entry_path(self, filename):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+
+        key = f'{os.path.abspath(filename)}|{st.st_size}|{st.st_mtime_ns}|{ModelCache.ENTRY_VERSION}'
+        return os.path.join(self.__cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + ModelCache.ENTRY_EXT)
+
+    @staticmethod
+    def __remove(entry_path):
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass    # still mapped by an open model on some platforms
+
+    def __evict(self):
+        # drop least recently used entries until the cache fits into max_bytes
+        entries = []
+        for name in os.listdir(self.__cache_dir):
+            if name.endswith(ModelCache.ENTRY_EXT):
+                st = os.stat(os.path.join(self.__cache_dir, name))
+                entries.append((st.st_mtime, st.st_size, name))
+
+        entries.sort()
+        total_bytes = sum(e[1] for e in entries)
+
+        for _, size, name in entries:
+            if total_bytes <= self.__max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.__cache_dir, name))
+                total_bytes -= size
+            except OSError:
+                pass    # still mapped by an open model on some platforms
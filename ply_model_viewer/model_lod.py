@@ -0,0 +1,134 @@
+"""@ package docstring
+Simplified levels of a model
+
+a level clusters the vertices of the model on a grid over its bounding box, each cell becomes one
+vertex at the mean of its vertices, edges inside a cell disappear and parallel ones are merged
+"""
+
+from threading import Thread, Event
+
+import numpy as np
+
+from common import WireframeModel
+from ply_file import unique_edges
+from edge_bvh import build_edge_bvh
+
+
+# grid resolutions tried, cells along the longest side of the bounding box, finest first
+LOD_RESOLUTIONS = [1024, 512, 256, 128, 64, 32, 16, 8]
+
+# a level is only kept when it has at most this fraction of the edges of the next finer one
+LOD_EDGE_RATIO = 0.5
+
+
+# -----------------------------------------------------------------------------#
+# LOD
+# -----------------------------------------------------------------------------#
+
+
+class LodLevel:
+    def __init__(self, resolution, model: WireframeModel):
+        self.__resolution = resolution
+        self.__model = model
+
+    @property
+    def resolution(self):
+        """grid cells along the longest side of the bounding box of the base model"""
+        return self.__resolution
+
+    @property
+    def model(self):
+        return self.__model
+
+
+def cluster_model(model: WireframeModel, resolution, origin, cell_size):
+    """the model with its vertices merged on a grid of cell_size cubes from origin"""
+    vertices = np.asarray(model.vertices, np.float64)
+    cells = np.clip(((vertices - origin) / cell_size).astype(np.int64), 0, resolution - 1)
+    keys = (cells[:, 0] * resolution + cells[:, 1]) * resolution + cells[:, 2]
+
+    # number the occupied cells, vertices of a cell are neighbours after the sort
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    is_first = np.empty(len(keys), bool)
+    is_first[:1] = True
+    np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=is_first[1:])
+    cluster_of = np.empty(len(keys), np.int64)
+    cluster_of[order] = np.cumsum(is_first) - 1
+    cluster_count = int(is_first.sum())
+
+    counts = np.bincount(cluster_of, minlength=cluster_count)
+    cluster_vertices = np.empty((cluster_count, 3), np.float32)
+    for axis in range(3):
+        cluster_vertices[:, axis] = np.bincount(cluster_of, vertices[:, axis], cluster_count) / counts
+
+    edges = np.asarray(model.edges)
+    cluster_edges = unique_edges(cluster_of[edges[:, 0]], cluster_of[edges[:, 1]], cluster_count)
+
+    return WireframeModel(cluster_vertices, cluster_edges, model.model_min, model.model_max)
+
+
+def build_lod_levels(model: WireframeModel, cancel_event=None, on_level=None):
+    """[LodLevel] of model, finest first
+
+    each level is clustered from the one before, on_level(levels) is called with the levels so far
+    whenever one is added
+    """
+    levels = []
+    if len(model.edges) == 0:
+        return levels
+
+    origin = np.array([model.model_min.x, model.model_min.y, model.model_min.z])
+    extent = np.array([model.model_max.x, model.model_max.y, model.model_max.z]) - origin
+    max_dim = float(extent.max())
+    if max_dim <= 0.0:
+        return levels
+
+    finer = model
+    for resolution in LOD_RESOLUTIONS:
+        if cancel_event and cancel_event.is_set():
+            break
+
+        level_model = cluster_model(finer, resolution, origin, max_dim / resolution)
+        if len(level_model.edges) > len(finer.edges) * LOD_EDGE_RATIO:
+            continue    # the grid is too fine to simplify this model much
+
+        build_edge_bvh(level_model)
+        levels.append(LodLevel(resolution, level_model))
+        finer = level_model
+        if on_level:
+            on_level(list(levels))
+
+    return levels
+
+
+# -----------------------------------------------------------------------------#
+# LodBuilder
+# -----------------------------------------------------------------------------#
+
+
+class LodBuilder(Thread):
+    """build the levels of a model on a worker thread
+
+    each level is published to model.lod_levels as soon as it is done, so the model is drawn at full
+    resolution first and picks up simplified levels while the rest are still being built
+    """
+    def __init__(self, model: WireframeModel):
+        Thread.__init__(self, daemon=True)
+        self.__model = model
+        self.__cancel_event = Event()
+
+    def cancel(self):
+        self.__cancel_event.set()
+
+    # override
+    def run(self):
+        try:
+            build_lod_levels(self.__model, self.__cancel_event, self.__on_level)
+        except Exception as e:
+            print(f'LodBuilder error: {e}\n')
+
+    def __on_level(self, levels):
+        # replaced as a whole, a frame reading the list meanwhile sees the old or the new one
+        if not self.__cancel_event.is_set():
+            self.__model.lod_levels = levels
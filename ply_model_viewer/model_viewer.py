@@ -4,11 +4,17 @@ Main business object that load, display meshes
 """
 
 import math
+import time
+from threading import Thread, Event
 
-from common import CanvasIntf, Vec3, Line3D
+import numpy as np
+
+from common import CanvasIntf, Vec3, WireframeModel
 from renderer import Renderer
 from camera import Camera
-from ply_file import load_ply_model
+from ply_file import load_ply_model, LoadCancelled
+from model_lod import LodBuilder
+from edge_bvh import build_edge_bvh
 
 
 # -----------------------------------------------------------------------------#
@@ -17,90 +23,278 @@ from ply_file import load_ply_model
 
 
 class ModelViewer:
-    def __init__(self, canvas_intf: CanvasIntf, fovy, proj_mode, viewport_w, viewport_h):
-        self.__renderer = Renderer(canvas_intf)
+
+    # while the camera is dragged a frame draws a random sample of the edges, its size follows the time the
+    # last frames took, to stay near this frame time
+    INTERACTIVE_FRAME_TIME = 1.0 / 30.0
+    MIN_INTERACTIVE_EDGES = 10000
+    INITIAL_INTERACTIVE_EDGES = 200000
+
+    # a simplified level is drawn once its grid cells are at most this many pixels wide on screen
+    LOD_CELL_PIXELS = 2.0
+
+    # how often the jobs of a frame in flight are looked at, in milliseconds
+    FRAME_POLL_INTERVAL_MS = 5
+
+    # how often the level builder is looked at for new levels, in milliseconds
+    LOD_POLL_INTERVAL_MS = 100
+
+    def __init__(self, canvas_intf: CanvasIntf, fovy, proj_mode, viewport_w, viewport_h, model_cache=None,
+                 job_backend=None, job_workers=None):
+        self.__model_cache = model_cache
+        self.__renderer = Renderer(canvas_intf, job_backend, job_workers)
         self.__renderer.set_proj_mode(proj_mode)
+        self.__proj_mode = proj_mode
         self.__camera = Camera(fovy, viewport_w, viewport_h)
-        self.__model_lines = []
+        self.__model = WireframeModel.empty()
+        self.__model_version = 0
         self.__model_center = Vec3(0.0, 0.0, 0.0)
         self.__model_size = Vec3(0.0, 0.0, 0.0)
 
+        self.__schedule_draw = None
+        self.__schedule_poll = None
+        self.__draw_pending = False
+        self.__presented_state = None   # render_state of the frame on screen, None to draw the next one
+
+        # a change bumps the generation, a frame in flight that began at an older one is out of date
+        self.__generation = 0
+        self.__frame = None     # (render_state, model, edge_count, start_time, generation) of the frame in flight
+        self.__last_frame_dropped = False
+
+        self.__interacting = False
+        self.__interactive_edges = ModelViewer.INITIAL_INTERACTIVE_EDGES
+
+        self.__lod_builder = None
+
     def quit(self):
+        self.__stop_lod_builder()
         self.__renderer.quit()
 
+    def set_draw_scheduler(self, schedule_draw, schedule_poll=None):
+        """schedule_draw(callback) runs callback once pending input is handled, e.g. Tk.after_idle,
+        schedule_poll(delay_ms, callback, *args) runs callback(*args) after delay_ms, e.g. Tk.after
+
+        with a scheduler, changes only request a frame, so a burst of input is drawn once, with
+        schedule_poll too, a frame pushes its jobs and returns, its jobs are polled and it is presented
+        once they are done, unless new input made it out of date meanwhile, and a frame is requested
+        whenever the level builder has added a level
+        """
+        self.__schedule_draw = schedule_draw
+        self.__schedule_poll = schedule_poll
+
+    def request_draw(self):
+        self.__generation += 1
+        if not self.__schedule_draw:
+            self.draw()
+        elif not self.__draw_pending:
+            self.__draw_pending = True
+            self.__schedule_draw(self.__on_draw_scheduled)
+
+    def __on_draw_scheduled(self):
+        if self.__draw_pending:
+            self.draw()
+
+    def invalidate(self):
+        """draw the next frame even if nothing it depends on changed, e.g. after the colors did"""
+        self.__presented_state = None
+        self.request_draw()
+
     def set_fovy(self, fovy):
         self.__camera.set_fovy(fovy)
-        self.draw()
+        self.request_draw()
 
     def set_proj_mode(self, proj_mode):
         self.__renderer.set_proj_mode(proj_mode)
+        self.__proj_mode = proj_mode
+        self.request_draw()
+
+    def set_canvas_intf(self, canvas_intf: CanvasIntf):
+        self.__renderer.set_canvas_intf(canvas_intf)
+        self.invalidate()
 
     def zoom_camera(self, factor):
         self.__camera.zoom(factor)
-        self.draw()
+        self.request_draw()
 
     def translate_camera(self, delta_pixel_x: int, delta_pixel_y: int):
         self.__camera.translate(delta_pixel_x, delta_pixel_y)
-        self.draw()
+        self.request_draw()
 
     def rotate_camera_around_center(self, delta_yaw_in_deg: float, delta_pitch_in_deg: float):
         self.__camera.rotate_around_center(math.radians(delta_yaw_in_deg), math.radians(delta_pitch_in_deg))
-        self.draw()
+        self.request_draw()
+
+    def begin_interaction(self):
+        """the camera is being dragged, frames are decimated until end_interaction"""
+        self.__interacting = True
 
-    def load_model(self, filename):
+    def end_interaction(self):
+        if self.__interacting:
+            self.__interacting = False
+            self.request_draw()     # full resolution, now that the camera stopped
+
+    def load_model(self, filename, use_mmap=False):
         try:
-            self.__model_lines, model_min, model_max = load_ply_model(filename)
-            self.__model_center = (model_min + model_max) * 0.5
-            self.__model_size = model_max - model_min
-            self.__init_camera_pos()
-            self.draw()
+            self.set_model(read_model(filename, use_mmap, model_cache=self.__model_cache), filename)
         except Exception as e:
             print(f'load_model error: {e}\n')
 
-    def load_test_cube(self):
-        self.clear_model()
-
-        # x
-        self.__model_lines.append(Line3D(Vec3(1.0, -1.0, -1.0), Vec3(1.0, 1.0, -1.0)))
-        self.__model_lines.append(Line3D(Vec3(1.0, -1.0, 1.0), Vec3(1.0, 1.0, 1.0)))
-
-        self.__model_lines.append(Line3D(Vec3(-1.0, -1.0, -1.0), Vec3(-1.0, 1.0, -1.0)))
-        self.__model_lines.append(Line3D(Vec3(-1.0, -1.0, 1.0), Vec3(-1.0, 1.0, 1.0)))
-
-        # y
-        self.__model_lines.append(Line3D(Vec3(-1.0, 1.0, -1.0), Vec3(1.0, 1.0, -1.0)))
-        self.__model_lines.append(Line3D(Vec3(-1.0, 1.0, 1.0), Vec3(1.0, 1.0, 1.0)))
+    def create_loader(self, filename, use_mmap=False):
+        return ModelLoader(filename, use_mmap, self.__model_cache)
 
-        self.__model_lines.append(Line3D(Vec3(-1.0, -1.0, -1.0), Vec3(1.0, -1.0, -1.0)))
-        self.__model_lines.append(Line3D(Vec3(-1.0, -1.0, 1.0), Vec3(1.0, -1.0, 1.0)))
+    def set_model(self, model: WireframeModel, filename=None):
+        """filename: the file model was read from, it gets an entry in the model cache if it has none yet"""
+        self.__replace_model(model)
+        self.__model_center = (model.model_min + model.model_max) * 0.5
+        self.__model_size = model.model_max - model.model_min
+        self.__init_camera_pos()
+        self.request_draw()
 
-        # z
-        self.__model_lines.append(Line3D(Vec3(-1.0, -1.0, -1.0), Vec3(-1.0, -1.0, 1.0)))
-        self.__model_lines.append(Line3D(Vec3(1.0, -1.0, -1.0), Vec3(1.0, -1.0, 1.0)))
+        # meanwhile the model is on screen
+        if filename and self.__model_cache:
+            Thread(target=self.__model_cache.store, args=(filename, model), daemon=True).start()
 
-        self.__model_lines.append(Line3D(Vec3(-1.0, 1.0, -1.0), Vec3(-1.0, 1.0, 1.0)))
-        self.__model_lines.append(Line3D(Vec3(1.0, 1.0, -1.0), Vec3(1.0, 1.0, 1.0)))
+    def load_test_cube(self):
+        # corner i has x, y, z = -1.0 or 1.0 by bits 0, 1, 2 of i
+        vertices = np.array([[-1.0, -1.0, -1.0], [1.0, -1.0, -1.0], [-1.0, 1.0, -1.0], [1.0, 1.0, -1.0],
+                             [-1.0, -1.0, 1.0], [1.0, -1.0, 1.0], [-1.0, 1.0, 1.0], [1.0, 1.0, 1.0]], np.float32)
+        edges = np.array([[1, 3], [5, 7], [0, 2], [4, 6],    # x
+                          [2, 3], [6, 7], [0, 1], [4, 5],    # y
+                          [0, 4], [1, 5], [2, 6], [3, 7]],   # z
+                         np.int32)
+        self.__replace_model(WireframeModel(vertices, edges, Vec3(-1.0, -1.0, -1.0), Vec3(1.0, 1.0, 1.0)))
 
         self.__model_center.zero()
         self.__model_size.set(2.0, 2.0, 2.0)
 
         self.__init_camera_pos()
-        self.draw()
+        self.request_draw()
 
     def clear_model(self):
-        self.__model_lines.clear()
-        self.draw()
+        self.__replace_model(WireframeModel.empty())
+        self.request_draw()
+
+    def __replace_model(self, model: WireframeModel):
+        self.__stop_lod_builder()
+        self.__renderer.release_shared_models()
+        self.__model = model
+        self.__model_version += 1
+
+        if model.bvh is None:
+            build_edge_bvh(model)
+
+        # simplified levels are built meanwhile the full model is on screen
+        if not model.lod_levels:
+            self.__lod_builder = LodBuilder(model)
+            self.__lod_builder.start()
+            if self.__schedule_poll:
+                self.__schedule_poll(ModelViewer.LOD_POLL_INTERVAL_MS, self.__poll_lod_builder, self.__lod_builder, 0)
+
+    def __poll_lod_builder(self, lod_builder, level_count):
+        if lod_builder is not self.__lod_builder:
+            return  # the model was replaced
+
+        # a builder that has ended has published all of its levels
+        alive = lod_builder.is_alive()
+        new_level_count = len(self.__model.lod_levels)
+        if new_level_count != level_count:
+            self.request_draw()     # the view may be drawn from a simplified level now
+        if alive:
+            self.__schedule_poll(ModelViewer.LOD_POLL_INTERVAL_MS, self.__poll_lod_builder, lod_builder,
+                                 new_level_count)
+
+    def __stop_lod_builder(self):
+        if self.__lod_builder:
+            self.__lod_builder.cancel()
+            self.__lod_builder = None
+
+    def __select_lod_model(self):
+        # the coarsest level whose cells are still below a pixel, the model itself when none is
+        levels = self.__model.lod_levels
+        if not levels:
+            return self.__model
+
+        radius = self.__model_size.length() * 0.5
+        screen_size = self.__camera.projected_size(self.__model_center, radius, self.__proj_mode)
+        if screen_size is None:
+            return self.__model
+
+        for level in reversed(levels):
+            if screen_size / level.resolution <= ModelViewer.LOD_CELL_PIXELS:
+                return level.model
+        return self.__model
 
     def draw(self):
-        self.__renderer.draw(self.__camera.eye_pos,
-                             self.__camera.eye_center,
-                             self.__camera.eye_up,
-                             self.__camera.fovy,
-                             self.__camera.viewport_w,
-                             self.__camera.viewport_h,
-                             self.__camera.z_near,
-                             self.__camera.z_far,
-                             self.__model_lines)
+        if self.__frame:
+            # the next frame begins once the one in flight has ended, see __poll_frame
+            self.__draw_pending = True
+            return
+
+        self.__draw_pending = False
+        model = self.__select_lod_model()
+        edge_count = self.__interactive_edges if self.__interacting else None
+        state = self.__render_state(model, edge_count)
+        if state == self.__presented_state:
+            return
+
+        self.__presented_state = None
+        start_time = time.perf_counter()
+        camera_args = (self.__camera.eye_pos,
+                       self.__camera.eye_center,
+                       self.__camera.eye_up,
+                       self.__camera.fovy,
+                       self.__camera.viewport_w,
+                       self.__camera.viewport_h,
+                       self.__camera.z_near,
+                       self.__camera.z_far)
+        if not self.__schedule_poll:
+            self.__end_frame(self.__renderer.draw(*camera_args, model, edge_count), state, model, edge_count,
+                             start_time)
+        elif self.__renderer.begin_frame(*camera_args, model, edge_count):
+            self.__frame = (state, model, edge_count, start_time, self.__generation)
+            self.__schedule_poll(ModelViewer.FRAME_POLL_INTERVAL_MS, self.__poll_frame)
+
+    def __poll_frame(self):
+        state, model, edge_count, start_time, generation = self.__frame
+
+        # out of date, but the frame after a dropped one is always presented, so continuous input still
+        # shows up
+        if generation != self.__generation and not self.__last_frame_dropped:
+            self.__renderer.drop_frame()
+
+        presented = self.__renderer.poll_frame()
+        if presented is None:
+            self.__schedule_poll(ModelViewer.FRAME_POLL_INTERVAL_MS, self.__poll_frame)
+            return
+
+        self.__frame = None
+        self.__last_frame_dropped = not presented
+        self.__end_frame(presented, state, model, edge_count, start_time)
+        if self.__draw_pending:
+            self.draw()
+
+    def __end_frame(self, presented, state, model, edge_count, start_time):
+        if presented:
+            self.__presented_state = state
+
+        if presented and edge_count is not None and edge_count < len(model.edges):
+            # scale the sample by how far off the frame time was, within limits so one slow frame
+            # does not throw it off
+            frame_time = time.perf_counter() - start_time
+            scale = min(max(ModelViewer.INTERACTIVE_FRAME_TIME / max(frame_time, 1e-6), 0.25), 2.0)
+            self.__interactive_edges = max(ModelViewer.MIN_INTERACTIVE_EDGES,
+                                           min(int(edge_count * scale), len(model.edges)))
+
+    def __render_state(self, model, edge_count):
+        """everything a frame depends on, a frame equal to the one on screen is not drawn again"""
+        camera = self.__camera
+        eye_pos = camera.eye_pos
+        eye_center = camera.eye_center
+        eye_up = camera.eye_up
+        # the levels of a model stay alive as long as its version is current, so their ids are unique
+        return (eye_pos.x, eye_pos.y, eye_pos.z, eye_center.x, eye_center.y, eye_center.z,
+                eye_up.x, eye_up.y, eye_up.z, camera.fovy, camera.viewport_w, camera.viewport_h,
+                camera.z_near, camera.z_far, self.__proj_mode, self.__model_version, id(model), edge_count)
 
     def __init_camera_pos(self):
         max_dim = max(self.__model_size.x, max(self.__model_size.y, self.__model_size.z))
@@ -108,3 +302,67 @@ class ModelViewer:
 
         cam_pos = Vec3(self.__model_center.x, self.__model_center.y, self.__model_center.z - max_dim * 2.0)
         self.__camera.set_pos(cam_pos, self.__model_center, z_far * 0.001, z_far)
+
+
+# -----------------------------------------------------------------------------#
+# read_model
+# -----------------------------------------------------------------------------#
+
+
+def read_model(filename, use_mmap=False, progress=None, cancel_event=None, model_cache=None):
+    """load_ply_model, or the entry of filename in model_cache when given, the model comes with its bvh
+
+    a parsed model is not stored here, ModelViewer.set_model does that once it has the model
+    """
+    if model_cache:
+        model = model_cache.load(filename, use_mmap)
+        if model:
+            if model.bvh is None:
+                build_edge_bvh(model)
+            return model
+
+    model = load_ply_model(filename, use_mmap, progress, cancel_event)
+    build_edge_bvh(model)     # before it is stored, so the cache keeps the edges in bvh order
+    return model
+
+
+# -----------------------------------------------------------------------------#
+# ModelLoader
+# -----------------------------------------------------------------------------#
+
+
+class ModelLoader(Thread):
+    """load a model on a worker thread
+
+    the owner polls is_alive(), reads the progress fields meanwhile and picks up model or error
+    once the thread has finished, both stay None if loading was cancelled
+    """
+    def __init__(self, filename, use_mmap=False, model_cache=None):
+        Thread.__init__(self, daemon=True)
+        self.filename = filename
+        self.model = None
+        self.error = None
+        self.stage = ''
+        self.done_bytes = 0
+        self.total_bytes = 0
+        self.__use_mmap = use_mmap
+        self.__model_cache = model_cache
+        self.__cancel_event = Event()
+
+    def cancel(self):
+        self.__cancel_event.set()
+
+    # override
+    def run(self):
+        try:
+            self.model = read_model(self.filename, self.__use_mmap, self.__on_progress, self.__cancel_event,
+                                    self.__model_cache)
+        except LoadCancelled:
+            pass
+        except Exception as e:
+            self.error = e
+
+    def __on_progress(self, stage, done_bytes, total_bytes):
+        self.stage = stage
+        self.done_bytes = done_bytes
+        self.total_bytes = total_bytes
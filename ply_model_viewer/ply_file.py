@@ -5,266 +5,690 @@ load ply file from disk
 
 
 from enum import IntEnum
-from common import Vec3, Line3D
+
+import os
+
+import numpy as np
+
+from common import Vec3, WireframeModel
+
+
+# map ply scalar type names to numpy type codes (byte order is added when the format is known)
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1',
+    'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2',
+    'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4',
+    'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4',
+    'double': 'f8', 'float64': 'f8',
+}
+
+# the body is read from disk in pieces of this size, so memory is bounded by the model arrays
+CHUNK_SIZE = 16 * 1024 * 1024
+
+# binary faces of one size are decoded as a run when at least this many follow each other, shorter runs
+# are resolved by scanning up to FACE_SCAN_BYTES of the body at once
+MIN_FACE_RUN = 16
+FACE_SCAN_BYTES = 64 * 1024
+
+
+class LoadCancelled(Exception):
+    pass
 
 
 # -----------------------------------------------------------------------------#
-# PLY
+# PlyColumn
 # -----------------------------------------------------------------------------#
 
-def load_ply_model(filename):
+class PlyColumn:
+    """the values of one scalar property of an element, typed as declared in the header
 
-    class FileFormat(IntEnum):
-        FMT_ASCII = 1
-        FMT_BINARY_BIG = 2
-        FMT_BINARY_LIT = 3
+    a column of a binary file only remembers where it is, and reads itself the first time
+    values is used
+    """
 
-    class PropertyType(IntEnum):
-        TYPE_FLOAT = 1
-        TYPE_UINT8 = 2
-
-    class PropertyName(IntEnum):
-        NAME_X = 1
-        NAME_Y = 2
-        NAME_Z = 3
-        NAME_NORMAL_X = 4
-        NAME_NORMAL_Y = 5
-        NAME_NORMAL_Z = 6
-        NAME_CONFIDENCE = 7
-        NAME_INTENSITY = 8
-        NAME_RED = 9
-        NAME_GREEN = 10
-        NAME_BLUE = 11
-        NAME_ALPHA = 12
-        NAME_S = 13
-        NAME_T = 14
-
-    def check_head():
-        if len(file_lines) < 1:
-            raise Exception('empty file')
-
-        first_line = file_lines[0]
-        if first_line != 'ply':
-            raise Exception('"{}" is not a ply file'.format(first_line))
+    def __init__(self, name, dtype, count, values=None, source=None):
+        self.__name = name
+        self.__dtype = np.dtype(dtype)
+        self.__count = count
+        self.__values = values
+        self.__source = source
 
-    def load_format() -> FileFormat:
-        for file_line in file_lines:
-            if file_line == 'end_header':
-                break
-            elif file_line.startswith('format ascii'):
-                return FileFormat.FMT_ASCII
-            elif file_line.startswith('format binary_big_endian'):
-                return FileFormat.FMT_BINARY_BIG
-            elif file_line.startswith('format binary_little_endian'):
-                return FileFormat.FMT_BINARY_LIT
-
-        raise Exception('format section not found')
-
-    def load_vertex_count() -> int:
-        for file_line in file_lines:
-            if file_line == 'end_header':
-                break
-            elif file_line.startswith('element vertex'):
-                sl = file_line.split()
-                if len(sl) >= 3:
-                    return int(sl[2])
+    @property
+    def source(self):
+        """(filename, offset, row_dtype) of the rows of a binary file the column is the field name of, or None"""
+        return self.__source
 
-        raise Exception('element vertex section not found')
+    @property
+    def name(self):
+        return self.__name
 
-    def load_face_count() -> int:
-        for file_line in file_lines:
-            if file_line == 'end_header':
-                break
-            elif file_line.startswith('element face'):
-                sl = file_line.split()
-                if len(sl) >= 3:
-                    return int(sl[2])
+    @property
+    def dtype(self):
+        return self.__dtype
 
-        raise Exception('element face section not found')
+    @property
+    def count(self):
+        return self.__count
 
-    def load_properties() -> list:
-        properties = []
+    @property
+    def loaded(self):
+        return self.__values is not None
 
-        x_found = False
-        y_found = False
-        z_found = False
+    @property
+    def values(self):
+        if self.__values is None:
+            filename, offset, row_dtype = self.__source
+            self.__values = read_column(filename, row_dtype, offset, self.__count, self.__name)
+        return self.__values
 
-        for file_line in file_lines:
-            if file_line == 'end_header':
-                break
-            elif file_line.startswith('property list'):
-                continue  # ignore
-            elif file_line.startswith('property'):
-                sl = file_line.split()
-                if len(sl) >= 3:
-                    type_str = sl[1]
-                    if type_str == 'float' or type_str == 'float32':
-                        tp = PropertyType.TYPE_FLOAT
-                    elif type_str == 'uchar' or type_str == 'uint8':
-                        tp = PropertyType.TYPE_UINT8
-                    else:
-                        raise Exception('unknown date type "{}"'.format(type_str))
 
-                    name_str = sl[2]
-                    if name_str == 'x':
-                        name = PropertyName.NAME_X
-                        x_found = True
-                    elif name_str == 'y':
-                        name = PropertyName.NAME_Y
-                        y_found = True
-                    elif name_str == 'z':
-                        name = PropertyName.NAME_Z
-                        z_found = True
-                    elif name_str == 'nx':
-                        name = PropertyName.NAME_NORMAL_X
-                    elif name_str == 'ny':
-                        name = PropertyName.NAME_NORMAL_Y
-                    elif name_str == 'nz':
-                        name = PropertyName.NAME_NORMAL_Z
-                    elif name_str == 'confidence':
-                        name = PropertyName.NAME_CONFIDENCE
-                    elif name_str == 'intensity':
-                        name = PropertyName.NAME_INTENSITY
-                    elif name_str == 'red':
-                        name = PropertyName.NAME_RED
-                    elif name_str == 'green':
-                        name = PropertyName.NAME_GREEN
-                    elif name_str == 'blue':
-                        name = PropertyName.NAME_BLUE
-                    elif name_str == 'alpha':
-                        name = PropertyName.NAME_ALPHA
-                    elif name_str == 's':
-                        name = PropertyName.NAME_S
-                    elif name_str == 't':
-                        name = PropertyName.NAME_T
-                    else:
-                        raise Exception('unknown property "{}"'.format(name_str))
-
-                    properties.append((tp, name))
-                else:
-                    raise Exception('too many property fields "{}"'.format(file_line))
+def read_column(filename, row_dtype, offset, count, name):
+    """field name of count records of row_dtype stored at offset in filename, in native byte order"""
+    field_dtype, field_offset = row_dtype.fields[name][:2]
+    if count == 0:
+        return np.zeros(0, field_dtype.newbyteorder('='))
 
-        if not x_found or not y_found or not z_found:
-            raise Exception('x, y, z not all found')
+    # only up to the end of the last value, the last row may be cut short, e.g. in a cache entry
+    data = np.memmap(filename, np.uint8, 'r', offset + field_offset,
+                     ((count - 1) * row_dtype.itemsize + field_dtype.itemsize,))
+    values = np.ndarray((count,), field_dtype, buffer=data, strides=(row_dtype.itemsize,))
+    return values.astype(field_dtype.newbyteorder('='))
 
-        return properties
 
-    def find_head_end_idx() -> int:
-        for i, file_line in enumerate(file_lines):
-            if file_line == 'end_header':
-                return i
-        raise Exception('head end section not found')
+# -----------------------------------------------------------------------------#
+# edges
+# -----------------------------------------------------------------------------#
 
-    def load_ascii(properties, vertex_start_idx, face_start_idx):
+# edges are packed into keys this many at a time, which bounds the temporary arrays next to the keys
+EDGE_KEY_BLOCK = 1 << 16
 
-        def make_line_id(v_idx1, v_idx2):
-            return f'{v_idx1}_{v_idx2}' if v_idx1 < v_idx2 else f'{v_idx2}_{v_idx1}'
 
-        model_min = Vec3(99999999.0, 99999999.0, 99999999.0)
-        model_max = Vec3(-99999999.0, -99999999.0, -99999999.0)
-        model_lines = []
+def pack_edge_keys(v_idx1, v_idx2, vertex_count, out):
+    """write the keys of the undirected edges v_idx1[i] - v_idx2[i] to the front of out, return how many
 
-        sz = len(file_lines)
-        vertex_stop_idx = vertex_start_idx + vertex_count
-        if vertex_stop_idx > sz:
-            raise Exception('vertex count overflow')
+    each edge is packed into one integer key min * vertex_count + max, so duplicates are
+    found by a single sort instead of a dict of per-edge keys, degenerate edges get no key
+    """
+    count = 0
+    for start in range(0, len(v_idx1), EDGE_KEY_BLOCK):
+        idx1 = v_idx1[start:start + EDGE_KEY_BLOCK]
+        idx2 = v_idx2[start:start + EDGE_KEY_BLOCK]
+        lo = np.minimum(idx1, idx2)
+        hi = np.maximum(idx1, idx2)
 
-        face_stop_idx = face_start_idx + face_count
-        if face_stop_idx > sz:
-            raise Exception('face count overflow')
+        keys = lo.astype(np.int64)
+        keys *= vertex_count
+        keys += hi
+        keys = keys[lo != hi]   # degenerate edges have no length
+        out[count:count + len(keys)] = keys
+        count += len(keys)
+    return count
 
-        vertices = []
-        sz_of_properties = len(properties)
-        for i in range(vertex_start_idx, vertex_stop_idx):
-            file_line = file_lines[i]
-            sl = file_line.split()
-            if len(sl) != sz_of_properties:
-                raise Exception('num properties should be {}'.format(sz_of_properties))
 
-            pt = Vec3(0.0, 0.0, 0.0)
+def sorted_edges(keys, vertex_count):
+    """the distinct keys of pack_edge_keys as an (E, 2) int32 array, keys is sorted in place"""
+    keys.sort()
+
+    # duplicates are neighbours after the sort, the distinct keys are moved to the front of keys
+    count = 0
+    prev = -1
+    for start in range(0, len(keys), EDGE_KEY_BLOCK):
+        block = keys[start:start + EDGE_KEY_BLOCK]
+        keep = np.empty(len(block), bool)
+        keep[0] = block[0] != prev
+        np.not_equal(block[1:], block[:-1], out=keep[1:])
+        prev = block[-1]
 
-            for j, s in enumerate(sl):
-                if properties[j][1] == PropertyName.NAME_X:
-                    pt.x = float(s)
-                elif properties[j][1] == PropertyName.NAME_Y:
-                    pt.y = float(s)
-                elif properties[j][1] == PropertyName.NAME_Z:
-                    pt.z = float(s)
+        kept = block[keep]
+        keys[count:count + len(kept)] = kept
+        count += len(kept)
 
-            if pt.x < model_min.x:
-                model_min.x = pt.x
+    edges = np.empty((count, 2), np.int32)
+    for start in range(0, count, EDGE_KEY_BLOCK):
+        stop = min(start + EDGE_KEY_BLOCK, count)
+        edges[start:stop, 0], edges[start:stop, 1] = np.divmod(keys[start:stop], vertex_count)
+    return edges
 
-            if pt.x > model_max.x:
-                model_max.x = pt.x
 
-            if pt.y < model_min.y:
-                model_min.y = pt.y
+def unique_edges(v_idx1, v_idx2, vertex_count):
+    """deduplicate the undirected edges v_idx1[i] - v_idx2[i] into an (E, 2) int32 array"""
+    keys = np.empty(len(v_idx1), np.int64)
+    return sorted_edges(keys[:pack_edge_keys(v_idx1, v_idx2, vertex_count, keys)], vertex_count)
 
-            if pt.y > model_max.y:
-                model_max.y = pt.y
 
-            if pt.z < model_min.z:
-                model_min.z = pt.z
+# -----------------------------------------------------------------------------#
+# PLY
+# -----------------------------------------------------------------------------#
 
-            if pt.z > model_max.z:
-                model_max.z = pt.z
+def load_ply_model(filename, use_mmap=False, progress=None, cancel_event=None):
+    """load a ply file
 
-            vertices.append(pt)
+    with use_mmap, the blocks of a binary file are views into a file mapping instead of copies,
+    so only the pages that are actually touched get read from disk
 
-        sz_of_vertices = len(vertices)
+    progress(stage, done_bytes, total_bytes) is called after every chunk, stage being the name of
+    the element in progress, and loading stops with LoadCancelled once cancel_event is set
 
-        # avoid add duplicate line
-        added_lines = {}
+    the scalar properties of the vertex element (other than x, y, z) and of the other elements
+    without lists end up in model.properties as {element: {property: PlyColumn}}, the scalar
+    properties of the face element are skipped
+    """
 
-        for i in range(face_start_idx, face_stop_idx):
-            file_line = file_lines[i]
-            sl = file_line.split()
-            if len(sl) > 0:
-                vertex_cnt = int(sl[0])
-                if vertex_cnt == 3:
-
-                    if len(sl) == 4:
-                        v_indices = [int(sl[1]), int(sl[2]), int(sl[3])]
-                        for v in v_indices:
-                            if v < 0 or v >= sz_of_vertices:
-                                raise Exception('vertex index overflow')
-
-                        for j in range(0, 3):
-                            v1 = v_indices[j]
-                            v2 = v_indices[(j+1)%3]
-                            line_id = make_line_id(v1, v2)
-                            if added_lines.get(line_id) is None:
-                                model_lines.append(Line3D(vertices[v1], vertices[v2]))
-                                added_lines[line_id] = 0   # dummy
-
-                    else:
-                        raise Exception('vertex num of face mismatch')
+    class FileFormat(IntEnum):
+        FMT_ASCII = 1
+        FMT_BINARY_BIG = 2
+        FMT_BINARY_LIT = 3
+
+    # numbers of an ascii body, parsed one chunk at a time, together with the number of values on
+    # each line, which is what separates faces of different sizes, lines are only counted for the
+    # elements that read them
+    class AsciiReader:
+        def __init__(self):
+            self.__values = np.zeros(0, np.float64)
+            self.__pos = 0
+            self.__texts = []       # [first value in __values, value count, chunk data, values per line or None]
+            self.__line_ends = None     # index in __values after the last value of a line, from the first text
+            self.__eof = False
+
+        @staticmethod
+        def count_line_values(data):
+            # a value starts where a non blank character follows a blank one, its line is the number of
+            # line feeds before it
+            chars = np.frombuffer(data, np.uint8)
+            blank = (chars == 32) | (chars == 9) | (chars == 13) | (chars == 10)
+            starts = ~blank
+            starts[1:] &= blank[:-1]
+            line_feeds = np.flatnonzero(chars == 10)
+            values_per_line = np.bincount(np.searchsorted(line_feeds, np.flatnonzero(starts)),
+                                          minlength=len(line_feeds) + 1)
+            return values_per_line[values_per_line > 0]
+
+        def __load_chunk(self):
+            data = f.read(CHUNK_SIZE)
+            if len(data) < CHUNK_SIZE:
+                self.__eof = True
+            else:
+                data += f.readline()    # never split a line between two chunks
+
+            if not data.strip():
+                return
+
+            new_values = np.fromstring(data, dtype=np.float64, sep=' ')
+
+            # texts whose values were all read are dropped
+            pos = self.__pos
+            self.__texts = [[first - pos, count, text, counts] for first, count, text, counts in self.__texts
+                            if first + count > pos]
+            self.__values = np.concatenate((self.__values[pos:], new_values))
+            self.__texts.append([len(self.__values) - len(new_values), len(new_values), data, None])
+            self.__pos = 0
+            self.__line_ends = None
+
+        def __get_line_ends(self):
+            if self.__line_ends is None:
+                if not self.__texts:
+                    return np.zeros(0, np.int64)
+                for text in self.__texts:
+                    if text[3] is None:
+                        text[3] = AsciiReader.count_line_values(text[2])
+                self.__line_ends = self.__texts[0][0] + np.cumsum(np.concatenate([t[3] for t in self.__texts]))
+            return self.__line_ends
+
+        def read(self, n):
+            while len(self.__values) - self.__pos < n and not self.__eof:
+                self.__load_chunk()
+            if len(self.__values) - self.__pos < n:
+                raise Exception('unexpected end of file')
+
+            r = self.__values[self.__pos:self.__pos + n]
+            self.__pos += n
+            return r
+
+        def read_lines(self, n):
+            # values of the next n lines and the value count of each of them
+            while True:
+                line_ends = self.__get_line_ends()
+                line = int(np.searchsorted(line_ends, self.__pos, side='right'))   # first line not read yet
+                if len(line_ends) - line >= n or self.__eof:
+                    break
+                self.__load_chunk()
+            if len(line_ends) - line < n:
+                raise Exception('unexpected end of file')
+
+            line_start = line_ends[line - 1] if line > 0 else self.__texts[0][0]
+            if line_start != self.__pos:
+                raise Exception('element does not start on a new line')
+
+            line_ends = line_ends[line:line + n]
+            r = self.__values[self.__pos:line_ends[-1]]
+            sizes = np.diff(line_ends, prepend=self.__pos)
+            self.__pos = int(line_ends[-1])
+            return r, sizes
+
+    def load_header():
+        # single pass over the header lines
+        first_line = f.readline().decode('ascii', errors='replace').strip()
+        if first_line != 'ply':
+            raise Exception('"{}" is not a ply file'.format(first_line))
+
+        fmt = None
+
+        # [(name, count, [(type_str, name_str, count_type_str or None for scalar)])] in file order
+        elements = []
 
+        while True:
+            raw_line = f.readline()
+            if not raw_line:
+                raise Exception('head end section not found')
+
+            file_line = raw_line.decode('ascii', errors='replace').strip()
+            sl = file_line.split()
+            if len(sl) == 0:
+                continue
+            elif sl[0] == 'end_header':
+                break
+            elif sl[0] == 'format':
+                if len(sl) < 2:
+                    raise Exception('bad format section "{}"'.format(file_line))
+                elif sl[1] == 'ascii':
+                    fmt = FileFormat.FMT_ASCII
+                elif sl[1] == 'binary_big_endian':
+                    fmt = FileFormat.FMT_BINARY_BIG
+                elif sl[1] == 'binary_little_endian':
+                    fmt = FileFormat.FMT_BINARY_LIT
                 else:
-                    raise Exception('face more than 3 vertices not supported yet')
-
-        return model_lines, model_min, model_max
-
-    # read file to memory
-    f = open(filename, "r")
-    file_lines = f.readlines()
-    f.close()
-
-    # strip \r\n
-    for idx, it in enumerate(file_lines):
-        it = it.replace('\n', '')
-        it = it.replace('\r', '')
-        file_lines[idx] = it
-
-    # parse from memory
-    check_head()
-    format_ = load_format()
-    vertex_count = load_vertex_count()
-    face_count = load_face_count()
-    properties_ = load_properties()
-    end_header_idx = find_head_end_idx()
-
-    if format_ == FileFormat.FMT_ASCII:
-        return load_ascii(properties_, end_header_idx + 1, end_header_idx + 1 + vertex_count)
-    else:
-        raise Exception('binary format not supported yet')
+                    raise Exception('unknown format "{}"'.format(sl[1]))
+            elif sl[0] == 'element':
+                if len(sl) < 3:
+                    raise Exception('bad element section "{}"'.format(file_line))
+                elements.append((sl[1], int(sl[2]), []))
+            elif sl[0] == 'property':
+                if len(elements) == 0:
+                    raise Exception('property outside element "{}"'.format(file_line))
+                if len(sl) >= 5 and sl[1] == 'list':
+                    prop = (sl[3], sl[4], sl[2])
+                elif len(sl) >= 3:
+                    prop = (sl[1], sl[2], None)
+                else:
+                    raise Exception('bad property section "{}"'.format(file_line))
+
+                for type_str in prop[0], prop[2]:
+                    if type_str is not None and type_str not in PLY_TYPES:
+                        raise Exception('unknown date type "{}"'.format(type_str))
+
+                elements[-1][2].append(prop)
+
+        if fmt is None:
+            raise Exception('format section not found')
+
+        element_names = [e[0] for e in elements]
+        if 'vertex' not in element_names:
+            raise Exception('element vertex section not found')
+        if 'face' not in element_names:
+            raise Exception('element face section not found')
+
+        return fmt, elements
+
+    def make_dtype(element_properties, list_len):
+        fields = []
+        for type_str, name_str, count_type_str in element_properties:
+            if count_type_str is None:
+                fields.append((name_str, byte_order + PLY_TYPES[type_str]))
+            else:
+                fields.append((name_str + '_count', byte_order + PLY_TYPES[count_type_str]))
+                fields.append((name_str, byte_order + PLY_TYPES[type_str], (list_len,)))
+        return np.dtype(fields)
+
+    def report(stage):
+        if cancel_event is not None and cancel_event.is_set():
+            raise LoadCancelled('loading "{}" cancelled'.format(filename))
+        if progress is not None:
+            progress(stage, f.tell(), file_size)
+
+    def read_rows(count, row_size=0, row_dtype=None):
+        # yield (first row, rows) pieces of an element, an (n, row_size) float array for ascii
+        # or a structured array of row_dtype for binary
+        if ascii_reader:
+            rows_per_chunk = max(1, CHUNK_SIZE // 8 // row_size)
+        else:
+            rows_per_chunk = max(1, CHUNK_SIZE // row_dtype.itemsize)
+
+        start = 0
+        while start < count:
+            n = min(rows_per_chunk, count - start)
+            if ascii_reader:
+                rows = ascii_reader.read(n * row_size).reshape(n, row_size)
+            else:
+                data = f.read(n * row_dtype.itemsize)
+                if len(data) < n * row_dtype.itemsize:
+                    raise Exception('unexpected end of file')
+                rows = np.frombuffer(data, row_dtype)
+            yield start, rows
+            start += n
+            report(element_name)
+
+    def map_rows(count, row_dtype):
+        offset = f.tell()
+        if offset + count * row_dtype.itemsize > len(file_map):
+            raise Exception('unexpected end of file')
+        f.seek(count * row_dtype.itemsize, 1)
+        return np.frombuffer(file_map, row_dtype, count, offset), offset
+
+    def map_vertices(count, element_properties):
+        row_dtype = make_dtype(element_properties, 0)
+        rows, offset = map_rows(count, row_dtype)
+
+        x_dtype, x_offset = row_dtype.fields['x'][:2]
+        y_dtype, y_offset = row_dtype.fields['y'][:2]
+        z_dtype, z_offset = row_dtype.fields['z'][:2]
+        if x_dtype == y_dtype == z_dtype and y_offset == x_offset + x_dtype.itemsize and \
+                z_offset == y_offset + y_dtype.itemsize:
+            # x, y, z are adjacent in every record: a strided (count, 3) view of the mapping
+            return np.ndarray((count, 3), x_dtype, buffer=file_map, offset=offset + x_offset,
+                              strides=(row_dtype.itemsize, x_dtype.itemsize))
+
+        return np.stack((rows['x'], rows['y'], rows['z']), axis=1)
+
+    def new_ascii_columns(count, element_properties, skipped):
+        # {name: (column, typed array)} for the scalar properties, filled while the rows are parsed
+        columns = {}
+        for column, (type_str, name_str, count_type_str) in enumerate(element_properties):
+            if count_type_str is None and name_str not in skipped:
+                columns[name_str] = (column, np.empty(count, PLY_TYPES[type_str]))
+        return columns
+
+    def fill_ascii_columns(columns, start, rows):
+        for column, values in columns.values():
+            values[start:start + len(rows)] = rows[:, column]
+
+    def keep_columns(name, count, element_properties, offset, skipped=(), parsed_columns=None):
+        # every scalar property becomes a PlyColumn, a binary one is read on first use only
+        row_dtype = make_dtype(element_properties, 0)
+        columns = {}
+        for type_str, name_str, count_type_str in element_properties:
+            if count_type_str is not None or name_str in skipped:
+                continue
+            elif parsed_columns is not None:
+                values = parsed_columns[name_str][1]
+                columns[name_str] = PlyColumn(name_str, values.dtype, count, values=values)
+            elif file_map is not None:
+                field_dtype, field_offset = row_dtype.fields[name_str][:2]
+                values = np.ndarray((count,), field_dtype, buffer=file_map, offset=offset + field_offset,
+                                    strides=(row_dtype.itemsize,))
+                columns[name_str] = PlyColumn(name_str, field_dtype, count, values=values,
+                                              source=(filename, offset, row_dtype))
+            else:
+                columns[name_str] = PlyColumn(name_str, row_dtype.fields[name_str][0], count,
+                                              source=(filename, offset, row_dtype))
+        element_columns[name] = columns
+
+    def load_vertices(count, element_properties):
+        names = [p[1] for p in element_properties]
+        if any(c not in names for c in ('x', 'y', 'z')):
+            raise Exception('x, y, z not all found')
+
+        offset = f.tell()
+        if file_map is not None:
+            positions = map_vertices(count, element_properties)
+            keep_columns('vertex', count, element_properties, offset, skipped=('x', 'y', 'z'))
+            return positions
+
+        # float32, unless the declared types need more, e.g. double coordinates stay float64
+        types = {p[1]: PLY_TYPES[p[0]] for p in element_properties}
+        positions = np.empty((count, 3), np.result_type(np.float32, types['x'], types['y'], types['z']))
+
+        if ascii_reader:
+            columns = [names.index('x'), names.index('y'), names.index('z')]
+            parsed_columns = new_ascii_columns(count, element_properties, skipped=('x', 'y', 'z'))
+            for start, rows in read_rows(count, row_size=len(element_properties)):
+                positions[start:start + len(rows)] = rows[:, columns]
+                fill_ascii_columns(parsed_columns, start, rows)
+            keep_columns('vertex', count, element_properties, offset, skipped=('x', 'y', 'z'),
+                         parsed_columns=parsed_columns)
+        else:
+            for start, rows in read_rows(count, row_dtype=make_dtype(element_properties, 0)):
+                stop = start + len(rows)
+                positions[start:stop, 0] = rows['x']
+                positions[start:stop, 1] = rows['y']
+                positions[start:stop, 2] = rows['z']
+            keep_columns('vertex', count, element_properties, offset, skipped=('x', 'y', 'z'))
+
+        return positions
+
+    def load_ascii_faces(count, element_properties, list_column):
+        blocks = []
+        lines_per_chunk = max(1, CHUNK_SIZE // 8 // (len(element_properties) + 3))
+
+        done = 0
+        while done < count:
+            values, sizes = ascii_reader.read_lines(min(lines_per_chunk, count - done))
+            line_starts = np.cumsum(sizes) - sizes
+
+            # each line is the scalar properties, the index count and the indices
+            face_sizes = values[line_starts + list_column].astype(np.int64)
+            if np.any(sizes != len(element_properties) + face_sizes):
+                raise Exception('vertex num of face mismatch')
+
+            # one int32 block per distinct face size, typically only a few
+            for face_size in np.unique(face_sizes).tolist():
+                selected = line_starts[face_sizes == face_size] + list_column + 1
+                indices = values[selected[:, np.newaxis] + np.arange(face_size)]
+                if indices.size > 0 and indices.max() > np.iinfo(np.int32).max:
+                    raise Exception('vertex index overflow')
+                blocks.append(indices.astype(np.int32))
+
+            done += len(sizes)
+            report(element_name)
+
+        return blocks
+
+    def load_binary_faces(count, element_properties, list_column):
+        prefix_size = make_dtype(element_properties[:list_column], 0).itemsize
+        suffix_size = make_dtype(element_properties[list_column + 1:], 0).itemsize
+        count_dtype = np.dtype(byte_order + PLY_TYPES[element_properties[list_column][2]])
+        index_dtype = np.dtype(byte_order + PLY_TYPES[element_properties[list_column][0]])
+        native_index_dtype = index_dtype.newbyteorder('=')
+        head_size = prefix_size + count_dtype.itemsize
+
+        def scan(buf, pos, max_faces):
+            # (starts, face sizes, end) of up to max_faces faces from pos on, without a loop per face: every
+            # byte offset gets the offset of the face that would follow a face starting there, and pointer
+            # jumping over these links finds the faces that really follow the one at pos
+            n = min(FACE_SCAN_BYTES, len(buf) - pos - head_size + 1)    # offsets with a complete head
+            count_at = np.ndarray((n,), count_dtype, buffer=buf, offset=pos + prefix_size, strides=(1,))
+            sizes = count_at.astype(np.int64)
+            links = np.arange(head_size + suffix_size, n + head_size + suffix_size) + sizes * index_dtype.itemsize
+
+            # the chain ends at n, past the scanned offsets or at a negative size
+            jump = np.append(np.where((links < n) & (sizes >= 0), links, n), n)
+            chain = np.zeros(1, np.int64)
+            while chain[-1] != n and len(chain) <= max_faces:
+                # chain holds the first 2^k faces, jump goes 2^k faces ahead
+                chain = np.concatenate((chain, jump[chain]))
+                jump = jump[jump]
+            starts = chain[chain < n][:max_faces]
+
+            last = starts[-1]
+            if sizes[last] < 0:
+                raise Exception('negative vertex num of face')
+            if pos + links[last] > len(buf):
+                starts = starts[:-1]    # the last face does not end in buf
+                end = pos + last
+            else:
+                end = pos + links[last]
+            return starts + pos, sizes[starts], int(end)
+
+        def walk(buf, max_faces):
+            # the offset of a face depends on the sizes of all faces before it, so faces are decoded in
+            # runs of equal size: a strided view checks how far the current size repeats, with a window
+            # that follows the run lengths seen so far, and the indices of the run become one view,
+            # where the size changes too often the faces are found by scan
+            raw = memoryview(buf)
+            pos = 0
+            done = 0
+            window = 64
+            runs = {}
+            while done < max_faces and pos + head_size <= len(buf):
+                face_size = int.from_bytes(raw[pos + prefix_size:pos + head_size], count_order,
+                                           signed=count_dtype.kind == 'i')
+                if face_size < 0:
+                    raise Exception('negative vertex num of face')
+                stride = head_size + face_size * index_dtype.itemsize + suffix_size
+                run_max = min(max_faces - done, (len(buf) - pos) // stride, window)
+                if run_max <= 0:
+                    break
+
+                face_sizes = np.ndarray((run_max,), count_dtype, buffer=buf, offset=pos + prefix_size,
+                                        strides=(stride,))
+                run = int((face_sizes != face_size).argmax()) or run_max   # the first face always matches
+
+                if run < min(MIN_FACE_RUN, run_max):
+                    starts, sizes, end = scan(buf, pos, max_faces - done)
+                    if len(starts) == 0:
+                        break
+                    index_at = np.ndarray((len(buf) - index_dtype.itemsize + 1,), index_dtype, buffer=buf,
+                                          strides=(1,))
+                    for face_size in np.unique(sizes).tolist():
+                        first_indices = starts[sizes == face_size] + head_size
+                        runs.setdefault(face_size, []).append(
+                            index_at[first_indices[:, np.newaxis] + np.arange(face_size) * index_dtype.itemsize])
+                    pos = end
+                    done += len(starts)
+                    window = 64
+                    continue
+
+                window = max(16, run * 2)
+
+                runs.setdefault(face_size, []).append(
+                    np.ndarray((run, face_size), index_dtype, buffer=buf, offset=pos + head_size,
+                               strides=(stride, index_dtype.itemsize)))
+                pos += run * stride
+                done += run
+
+            # one native block per face size
+            for face_size, views in runs.items():
+                blocks.append(np.concatenate(views, dtype=native_index_dtype))
+
+            return pos, done
+
+        count_order = 'big' if byte_order == '>' else 'little'
+        blocks = []
+        if file_map is not None:
+            face_start = f.tell()
+            consumed, faces_done = walk(file_map[face_start:], count)
+            if faces_done < count:
+                raise Exception('unexpected end of file')
+            f.seek(face_start + consumed)
+            return blocks
+
+        faces_done = 0
+        buf = b''
+        while faces_done < count:
+            data = f.read(CHUNK_SIZE)
+            if not data:
+                raise Exception('unexpected end of file')
+            buf = np.frombuffer(bytes(buf) + data, np.uint8)
+
+            consumed, done = walk(buf, count - faces_done)
+            buf = buf[consumed:]
+            faces_done += done
+            report(element_name)
+
+        f.seek(-len(buf), 1)    # give back what belongs to the next element
+        return blocks
+
+    def load_faces(count, element_properties):
+        # faces come back as a list of (faces, size) index blocks, each block has one face size
+        list_properties = [p for p in element_properties if p[2] is not None]
+        if len(list_properties) != 1 or list_properties[0][1] not in ('vertex_indices', 'vertex_index'):
+            raise Exception('face element should have exactly one vertex index list')
+        list_column = element_properties.index(list_properties[0])
+
+        if count == 0:
+            return []
+        elif ascii_reader:
+            return load_ascii_faces(count, element_properties, list_column)
+        else:
+            return load_binary_faces(count, element_properties, list_column)
+
+    def skip_element(name, count, element_properties):
+        # other elements are kept as columns only
+        if any(p[2] is not None for p in element_properties):
+            raise Exception('list property in element "{}" not supported'.format(name))
+
+        offset = f.tell()
+        if ascii_reader:
+            parsed_columns = new_ascii_columns(count, element_properties, skipped=())
+            for start, rows in read_rows(count, row_size=len(element_properties)):
+                fill_ascii_columns(parsed_columns, start, rows)
+            keep_columns(name, count, element_properties, offset, parsed_columns=parsed_columns)
+        else:
+            element_size = make_dtype(element_properties, 0).itemsize * count
+            if offset + element_size > file_size:
+                raise Exception('unexpected end of file')
+            f.seek(element_size, 1)
+            keep_columns(name, count, element_properties, offset)
+
+    def make_model(positions, face_blocks):
+        for block in face_blocks:
+            if block.size > 0 and (block.min() < 0 or block.max() >= len(positions)):
+                raise Exception('vertex index overflow')
+
+        # bounding box in a single reduction
+        if len(positions) > 0:
+            min_xyz = positions.min(axis=0).tolist()
+            max_xyz = positions.max(axis=0).tolist()
+        else:
+            min_xyz = [99999999.0, 99999999.0, 99999999.0]
+            max_xyz = [-99999999.0, -99999999.0, -99999999.0]
+        model_min = Vec3(min_xyz[0], min_xyz[1], min_xyz[2])
+        model_max = Vec3(max_xyz[0], max_xyz[1], max_xyz[2])
+
+        # every face contributes the edges between its consecutive corners, closing back to the first, their
+        # keys go straight into one array, a key for each corner
+        keys = np.empty(sum(block.size for block in face_blocks), np.int64)
+        key_count = 0
+        for block in face_blocks:
+            face_size = block.shape[1]
+            for corner in range(face_size):
+                key_count += pack_edge_keys(block[:, corner], block[:, (corner + 1) % face_size], len(positions),
+                                            keys[key_count:])
+        edges = sorted_edges(keys[:key_count], len(positions))
+
+        return WireframeModel(positions, edges, model_min, model_max, element_columns)
+
+    # stream the file, elements follow each other in header order
+    with open(filename, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        format_, elements = load_header()
+
+        file_map = None
+        if format_ == FileFormat.FMT_ASCII:
+            ascii_reader = AsciiReader()
+            byte_order = '='
+        else:
+            ascii_reader = None
+            byte_order = '<' if format_ == FileFormat.FMT_BINARY_LIT else '>'
+            if use_mmap:
+                body_start = f.tell()
+                file_map = np.memmap(f, dtype=np.uint8, mode='r')
+                f.seek(body_start)
+
+        positions_ = None
+        faces_ = None
+        element_columns = {}
+        for element_name, element_count, properties_ in elements:
+            if element_name == 'vertex':
+                positions_ = load_vertices(element_count, properties_)
+            elif element_name == 'face':
+                faces_ = load_faces(element_count, properties_)
+            else:
+                skip_element(element_name, element_count, properties_)
+            report(element_name)
+
+        report('edges')
+        ascii_reader = None     # its last chunk is not needed for the edges
+        return make_model(positions_, faces_)
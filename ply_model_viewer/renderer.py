@@ -5,11 +5,14 @@ convert 3d line segments into 2d screen space counterpart
 """
 
 import math
+from collections import OrderedDict
+
+import numpy as np
+import PIL.Image
+import PIL.ImageDraw
 
 import common
-from common import CanvasIntf, Vec2, Vec3, Vec4, Mat4, ParallelJobSys
-from threading import Lock
-import time
+from common import CanvasIntf, Vec3, Mat4, ParallelJobSys, WireframeModel
 
 
 # -----------------------------------------------------------------------------#
@@ -17,149 +20,402 @@ import time
 # -----------------------------------------------------------------------------#
 
 
+# pixels a single pass of rasterize_lines works on, bounds its temporary arrays
+MAX_RASTER_PIXELS = 1 << 20
+
+# longer lines are cheaper to draw one by one with PIL than to expand into pixels with numpy
+LONG_LINE_PIXELS = 64
+
+
+def rasterize_lines(lines, mask):
+    """set the pixels of mask, a (h, w) bool array, that lines, an (N, 4) array of x1, y1, x2, y2, pass through"""
+    h, w = mask.shape
+    lines = np.asarray(lines, np.float64)
+    x1, y1, x2, y2 = lines.T
+    dx = x2 - x1
+    dy = y2 - y1
+    steps = np.rint(np.maximum(np.abs(dx), np.abs(dy))).astype(np.int64)
+
+    is_long = steps >= LONG_LINE_PIXELS
+    if is_long.any():
+        image = PIL.Image.new('1', (w, h))
+        draw_line = PIL.ImageDraw.Draw(image).line
+        for view_points in lines[is_long].tolist():
+            draw_line(view_points, fill=1)
+        mask |= np.asarray(image)
+
+        is_short = ~is_long
+        x1, y1, dx, dy, steps = x1[is_short], y1[is_short], dx[is_short], dy[is_short], steps[is_short]
+
+    # dda for the rest, one pixel per step along the major axis
+    pixel_counts = steps + 1
+    ends = np.cumsum(pixel_counts)
+
+    start = 0
+    while start < len(steps):
+        base = ends[start - 1] if start > 0 else 0
+        stop = max(start + 1, int(np.searchsorted(ends, base + MAX_RASTER_PIXELS, 'right')))
+
+        counts = pixel_counts[start:stop]
+        line_idx = np.repeat(np.arange(start, stop), counts)
+        step_idx = np.arange(ends[stop - 1] - base) - np.repeat(ends[start:stop] - counts - base, counts)
+        t = step_idx / np.maximum(steps, 1)[line_idx]
+
+        x = (x1[line_idx] + dx[line_idx] * t).astype(np.int64)
+        y = (y1[line_idx] + dy[line_idx] * t).astype(np.int64)
+        mask[np.clip(y, 0, h - 1), np.clip(x, 0, w - 1)] = True
+
+        start = stop
+
+
+def compute_outcodes(clip_planes, clip_pts):
+    """bit i of the code of a point is set when it is outside clip plane i, clip_pts is (4, n)"""
+    dist = clip_planes @ clip_pts
+    outcodes = np.zeros(clip_pts.shape[1], np.uint8)
+    for bit in range(len(clip_planes)):
+        outcodes |= (dist[bit] < 0.0).view(np.uint8) << np.uint8(bit)
+    return outcodes
+
+
+def split_ranges(ranges, chunk_size):
+    """cut (R, 2) ranges of edges into a list of (r, 2) arrays of chunk_size edges each, but for the last"""
+    chunks = []
+    chunk = []
+    chunk_edges = 0
+    for start, stop in ranges.tolist():
+        while start < stop:
+            take = min(stop - start, chunk_size - chunk_edges)
+            chunk.append((start, start + take))
+            chunk_edges += take
+            start += take
+            if chunk_edges == chunk_size:
+                chunks.append(np.array(chunk, np.int64))
+                chunk = []
+                chunk_edges = 0
+    if chunk:
+        chunks.append(np.array(chunk, np.int64))
+    return chunks
+
+
 class Renderer:
 
+    class RunVertexStage:
+
+        # transform a range of vertices into clip space once for all the edges that share them
+
+        # vertices that are not float64 yet are converted a block at a time into one scratch buffer of the job
+        SCRATCH_VERTICES = 4096
+
+        def __init__(self, clip_planes, mat, vertices, start_idx, stop_idx, out_clip_vertices, out_outcodes):
+            self.__clip_planes = clip_planes
+            self.__mat = mat
+            self.__vertices = vertices
+            self.__start_idx = start_idx
+            self.__stop_idx = stop_idx
+            self.__out_clip_vertices = out_clip_vertices    # (4, stop_idx - start_idx)
+            self.__out_outcodes = out_outcodes              # stop_idx - start_idx
+
+        def exec(self):
+            vertices = self.__vertices[self.__start_idx:self.__stop_idx]
+            if vertices.dtype == np.float64:
+                clip_pts = self.__mat.transform_points_into(vertices, self.__out_clip_vertices)
+            else:
+                clip_pts = self.__out_clip_vertices
+                scratch = np.empty((min(len(vertices), Renderer.RunVertexStage.SCRATCH_VERTICES), 3), np.float64)
+                for start in range(0, len(vertices), len(scratch)):
+                    block = scratch[:len(vertices) - start]
+                    block[:] = vertices[start:start + len(block)]
+                    self.__mat.transform_points_into(block, clip_pts[:, start:start + len(block)])
+
+            self.__out_outcodes[:] = compute_outcodes(self.__clip_planes, clip_pts)
+            return clip_pts.shape[1]
+
     class RunGeometryPipeline:
 
-        def __init__(self, renderer, clip_planes, mat, viewport_w, viewport_h,
-                     lines_3d, start_idx, stop_idx, canvas_lines_pool):
-            self.__renderer = renderer
+        # runs on a worker thread or a worker process, so it only holds arrays, numbers and a Mat4
+
+        # clip_vertices, outcodes: the result of the vertex stage, the end points are gathered from them
+        # instead of transformed, mat and vertices are not used then
+        def __init__(self, clip_planes, mat, viewport_w, viewport_h,
+                     vertices, edges, edge_ranges, edge_step, out_lines, clip_vertices=None, outcodes=None):
             self.__mat = mat
             self.__viewport_h = viewport_h
             self.__half_viewport_w = viewport_w * 0.5
             self.__half_viewport_h = viewport_h * 0.5
-            self.__lines_3d = lines_3d
-            self.__start_idx = start_idx
-            self.__stop_idx = stop_idx
-            self.__canvas_lines_pool = canvas_lines_pool
+            self.__vertices = vertices
+            self.__edges = edges
+            self.__edge_ranges = edge_ranges    # (R, 2) start and stop into edges
+            self.__edge_step = edge_step        # every edge_step-th edge of a range is drawn
+            self.__out_lines = out_lines        # a row for each edge drawn
             self.__clip_planes = clip_planes
+            self.__clip_vertices = clip_vertices
+            self.__outcodes = outcodes
 
-        def convert_to_screen_space(self, v4):
-            # do perspective division
-            x = v4.x / v4.w
-            y = v4.y / v4.w
+        def convert_to_screen_space(self, clip_pts):
+            # do perspective division, clip_pts is (4, n)
+            x = clip_pts[0] / clip_pts[3]
+            y = clip_pts[1] / clip_pts[3]
 
             # convert to screen space
             x_ = x * self.__half_viewport_w + self.__half_viewport_w
             y_ = y * self.__half_viewport_h + self.__half_viewport_h
 
-            v2 = Vec2(x_, self.__viewport_h - y_)  # flip y
+            return x_, self.__viewport_h - y_  # flip y
 
-            return v2
+        def write_lines(self, first_row, clip_pt1, clip_pt2):
+            # screen space lines into out_lines from first_row on, returns the row after them
+            line_count = clip_pt1.shape[1]
+            lines = self.__out_lines[first_row:first_row + line_count]
+            lines[:, 0], lines[:, 1] = self.convert_to_screen_space(clip_pt1)
+            lines[:, 2], lines[:, 3] = self.convert_to_screen_space(clip_pt2)
+            return first_row + line_count
 
         def exec(self):
-
-            def clip_line_segment(clip_pt1, clip_pt2) -> list:
-
-                def clip_point_inside_clip_plane(pt) -> bool:
-                    return (clip_plane.x * pt.x +
-                            clip_plane.y * pt.y +
-                            clip_plane.z * pt.z +
-                            clip_plane.w * pt.w) >= 0.0
-
-                def calc_intersect(pt1, pt2):
-                    dist_pt1 = clip_plane.x * pt1.x + clip_plane.y * pt1.y + clip_plane.z * pt1.z + clip_plane.w * pt1.w
-                    dist_pt2 = clip_plane.x * pt2.x + clip_plane.y * pt2.y + clip_plane.z * pt2.z + clip_plane.w * pt2.w
-
-                    f = -dist_pt1 / (dist_pt2 - dist_pt1)
-                    delta = pt2 - pt1
-                    return pt1 + delta * f
-
-                local_clip_result = [clip_pt1, clip_pt2]
-
-                for clip_plane in self.__clip_planes:   # clip to each plane
-                    if len(local_clip_result) != 2:
-                        return local_clip_result   # clipped away
-
-                    clip_pt1 = local_clip_result[0]
-                    clip_pt2 = local_clip_result[1]
-                    local_clip_result.clear()
-
-                    if clip_point_inside_clip_plane(clip_pt1):
-                        if not clip_point_inside_clip_plane(clip_pt2):
-                            inter_pt = calc_intersect(clip_pt1, clip_pt2)
-                            local_clip_result.append(clip_pt1)
-                            local_clip_result.append(inter_pt)
-                        else:
-                            local_clip_result.append(clip_pt1)
-                            local_clip_result.append(clip_pt2)
-                    elif clip_point_inside_clip_plane(clip_pt2):
-                        inter_pt = calc_intersect(clip_pt1, clip_pt2)
-                        local_clip_result.append(inter_pt)
-                        local_clip_result.append(clip_pt2)
-
-                return local_clip_result
-
-            for i in range(self.__start_idx, self.__stop_idx):
-                line3d = self.__lines_3d[i]
-
-                # clip avoid w <= 0.0    if w < 0.0 will course object flipping
-
-                # clip in homogeneous clip space
-
-                # point inside the clip volume
-                # -clip.w <= clip.x <= clip.w
-                # -clip.w <= clip.y <= clip.w
-                # -clip.w <= clip.z <= clip.w
-
-                vec4_pt1 = Vec4(line3d.pt1.x, line3d.pt1.y, line3d.pt1.z, 1.0)
-                vec4_prj_pt1 = self.__mat.transform(vec4_pt1)
-
-                vec4_pt2 = Vec4(line3d.pt2.x, line3d.pt2.y, line3d.pt2.z, 1.0)
-                vec4_prj_pt2 = self.__mat.transform(vec4_pt2)
-
-                clip_result = clip_line_segment(vec4_prj_pt1, vec4_prj_pt2)
-                if len(clip_result) == 2:
-                    # entirely or partially inside the clip volume
-                    pt1_2d = self.convert_to_screen_space(clip_result[0])
-                    pt2_2d = self.convert_to_screen_space(clip_result[1])
-                    self.__canvas_lines_pool.append((pt1_2d, pt2_2d))
-
-            self.__renderer.inc_finished_tasks()
-
-    def __init__(self, canvas_intf: CanvasIntf):
-        self.__parallel_job_sys = ParallelJobSys()
+            # the whole range of edges goes through each stage at once
+
+            step = self.__edge_step
+            if len(self.__edge_ranges) == 1:
+                start, stop = self.__edge_ranges[0]
+                edges = self.__edges[start:stop:step]
+            else:
+                edges = np.concatenate([self.__edges[start:stop:step] for start, stop in self.__edge_ranges.tolist()])
+
+            # clip avoid w <= 0.0    if w < 0.0 will course object flipping
+
+            # clip in homogeneous clip space
+
+            # point inside the clip volume
+            # -clip.w <= clip.x <= clip.w
+            # -clip.w <= clip.y <= clip.w
+            # -clip.w <= clip.z <= clip.w
+
+            # the end points are (4, 2n), first end points in the first n columns
+            edge_count = len(edges)
+            if self.__clip_vertices is not None:
+                end_points = edges.T.ravel()
+                clip_pts = np.take(self.__clip_vertices, end_points, axis=1)
+                outcodes = self.__outcodes[end_points]
+            else:
+                # both end points of every edge with a single matrix product, w of the model points is 1.0
+                clip_pts = self.__mat.transform_points(self.__vertices[edges.T.ravel()])
+                outcodes = compute_outcodes(self.__clip_planes, clip_pts)
+            clip_pt1 = clip_pts[:, :edge_count]
+            clip_pt2 = clip_pts[:, edge_count:]
+            outcode1 = outcodes[:edge_count]
+            outcode2 = outcodes[edge_count:]
+
+            # both end points inside the clip volume, nothing to clip
+            accepted = (outcode1 | outcode2) == 0
+            if accepted.all():
+                return self.write_lines(0, clip_pt1, clip_pt2)
+            line_count = self.write_lines(0, clip_pt1[:, accepted], clip_pt2[:, accepted])
+
+            # both end points outside the same plane, nothing to draw, the rest may cross the clip volume
+            to_clip = ~accepted & ((outcode1 & outcode2) == 0)
+            clip_pt1 = clip_pt1[:, to_clip]
+            clip_pt2 = clip_pt2[:, to_clip]
+
+            # only the planes an end point of them is outside of, all of them are inside the others
+            to_clip_outcodes = outcode1[to_clip] | outcode2[to_clip]
+            plane_bits = int(np.bitwise_or.reduce(to_clip_outcodes)) if len(to_clip_outcodes) > 0 else 0
+
+            for bit, clip_plane in enumerate(self.__clip_planes):   # clip to each plane
+                if not plane_bits & (1 << bit):
+                    continue
+                dist_pt1 = clip_plane @ clip_pt1
+                dist_pt2 = clip_plane @ clip_pt2
+                pt1_inside = dist_pt1 >= 0.0
+                pt2_inside = dist_pt2 >= 0.0
+
+                # move the outside end point of a crossing edge onto the plane
+                crossing = np.flatnonzero(pt1_inside != pt2_inside)
+                if len(crossing) > 0:
+                    f = -dist_pt1[crossing] / (dist_pt2[crossing] - dist_pt1[crossing])
+                    inter_pts = clip_pt1[:, crossing] + (clip_pt2[:, crossing] - clip_pt1[:, crossing]) * f
+
+                    pt1_outside = ~pt1_inside[crossing]
+                    clip_pt1[:, crossing[pt1_outside]] = inter_pts[:, pt1_outside]
+                    clip_pt2[:, crossing[~pt1_outside]] = inter_pts[:, ~pt1_outside]
+
+                # clipped away when both are outside
+                inside = pt1_inside | pt2_inside
+                if not inside.all():
+                    clip_pt1 = clip_pt1[:, inside]
+                    clip_pt2 = clip_pt2[:, inside]
+
+            # entirely or partially inside the clip volume, the number of lines is the result of the job
+            return self.write_lines(line_count, clip_pt1, clip_pt2)
+
+    class SharedModel:
+        """the arrays of a model the jobs work on, in shared memory with the process backend"""
+
+        def __init__(self, parallel_job_sys: ParallelJobSys, model: WireframeModel):
+            self.__parallel_job_sys = parallel_job_sys
+            self.__model = model
+            self.__vertices = parallel_job_sys.share(model.vertices)
+            self.__edges = parallel_job_sys.share(model.edges)
+            self.__clip_vertices = parallel_job_sys.alloc_shared((4, len(model.vertices)), np.float64)
+            self.__outcodes = parallel_job_sys.alloc_shared((len(model.vertices),), np.uint8)
+            self.__out_lines = parallel_job_sys.alloc_shared((len(model.edges), 4), np.float64)
+
+        @property
+        def vertices(self):
+            return self.__vertices
+
+        @property
+        def edges(self):
+            return self.__edges
+
+        @property
+        def clip_vertices(self):
+            """(4, V) output of the vertex stage"""
+            return self.__clip_vertices
+
+        @property
+        def outcodes(self):
+            return self.__outcodes
+
+        @property
+        def out_lines(self):
+            """a row for every edge, the jobs of a frame get consecutive parts, each fills the front of its own"""
+            return self.__out_lines
+
+        def release(self):
+            for array in [self.__vertices, self.__edges, self.__clip_vertices, self.__outcodes, self.__out_lines]:
+                if array is not None:
+                    self.__parallel_job_sys.release_shared(array)
+            self.__model = None
+            self.__vertices = None
+            self.__edges = None
+            self.__clip_vertices = None
+            self.__outcodes = None
+            self.__out_lines = None
+
+    class Frame:
+        # a frame between begin_frame and the poll_frame that ends it, the jobs of one stage are in flight
+
+        def __init__(self, shared_model, mvp, viewport_w, viewport_h, edge_ranges, edge_step):
+            self.shared_model = shared_model
+            self.mvp = mvp
+            self.viewport_w = viewport_w
+            self.viewport_h = viewport_h
+            self.edge_ranges = edge_ranges
+            self.edge_step = edge_step
+            self.clip_vertices = None   # set when the frame has a vertex stage
+            self.outcodes = None
+            self.vertex_futures = []
+            self.line_futures = []      # [(first row in out_lines, future)]
+            self.job_timings = []
+            self.dropped = False
+
+        @property
+        def futures(self):
+            """the futures of the stage in flight"""
+            return [future for _, future in self.line_futures] if self.line_futures else self.vertex_futures
+
+    # a frame is cut into about this many chunks per worker, idle workers pull the next chunk, so a
+    # worker whose chunks are mostly culled just takes more of them
+    CHUNKS_PER_WORKER = 8
+    MIN_CHUNK_EDGES = 8192
+    MIN_CHUNK_VERTICES = 16384
+
+    # models kept shared at once, a model and its simplified levels are drawn in turns
+    MAX_SHARED_MODELS = 4
+
+    def __init__(self, canvas_intf: CanvasIntf, job_backend=None, job_workers=None):
+        self.__parallel_job_sys = ParallelJobSys(job_backend, job_workers)
         self.__canvas_intf = canvas_intf
-        self.__lock = Lock()
-        self.__finished_tasks = 0
+        self.__job_timings = []
 
         self.__projection_matrix = Mat4()
         self.__view_matrix = Mat4()
+        self.__mvp_matrix = Mat4()
 
         self.__proj_mode = common.PROJ_MODE_PERSPECTIVE
 
+        self.__shared_models = OrderedDict()    # model: SharedModel, most recently drawn last
+        self.__frame = None     # Frame in flight
+
         # left-handed
-        self.__clip_planes = [
-            # keep w == 1.0, in function 'clip_point_inside_clip_plane', D = line.w * p.w
-            Vec4(0.0, 0.0, 1.0, 1.0),  # near
-            Vec4(0.0, 0.0, -1.0, 1.0),  # far
-            Vec4(1.0, 0.0, 0.0, 1.0),  # left
-            Vec4(-1.0, 0.0, 0.0, 1.0),  # right
-            Vec4(0.0, -1.0, 0.0, 1.0),  # top
-            Vec4(0.0, 1.0, 0.0, 1.0)  # bottom
-        ]
+        self.__clip_planes = np.array([
+            # keep w == 1.0, a point p is inside when dot(plane, p) >= 0.0
+            [0.0, 0.0, 1.0, 1.0],  # near
+            [0.0, 0.0, -1.0, 1.0],  # far
+            [1.0, 0.0, 0.0, 1.0],  # left
+            [-1.0, 0.0, 0.0, 1.0],  # right
+            [0.0, -1.0, 0.0, 1.0],  # top
+            [0.0, 1.0, 0.0, 1.0]  # bottom
+        ])
 
     def quit(self):
+        # drop the shared arrays first, so their blocks can be closed
+        self.release_shared_models()
         self.__parallel_job_sys.quit()
 
     def set_proj_mode(self, proj_mode):
         self.__proj_mode = proj_mode
 
-    def inc_finished_tasks(self):
-        self.__lock.acquire()
-        self.__finished_tasks += 1
-        self.__lock.release()
-
-    def __get_finished_tasks(self):
-        self.__lock.acquire()
-        r = self.__finished_tasks
-        self.__lock.release()
-        return r
+    def set_canvas_intf(self, canvas_intf: CanvasIntf):
+        self.__canvas_intf = canvas_intf
 
-    # lines: defined in 3D space
-    def draw(self, eye: Vec3, center: Vec3, up: Vec3, fovy, viewport_w, viewport_h, z_near, z_far, lines):
+    def release_shared_models(self):
+        """free the arrays shared for the models drawn so far, e.g. when the model is replaced
+
+        a frame in flight is dropped, its running jobs are waited for, as they use the arrays
+        """
+        if self.__frame:
+            self.drop_frame()
+            ParallelJobSys.wait(self.__frame.futures)
+            self.__frame = None
+        for shared_model in self.__shared_models.values():
+            shared_model.release()
+        self.__shared_models.clear()
+
+    def __share_model(self, model: WireframeModel):
+        # once per model, a frame only sends the matrix and the viewport to the jobs
+        shared_model = self.__shared_models.pop(model, None)
+        if shared_model is None:
+            while len(self.__shared_models) >= Renderer.MAX_SHARED_MODELS:
+                _, evicted = self.__shared_models.popitem(last=False)
+                evicted.release()
+            shared_model = Renderer.SharedModel(self.__parallel_job_sys, model)
+        self.__shared_models[model] = shared_model
+        return shared_model
+
+    @property
+    def job_timings(self):
+        """[(exec_time, total_time)] in seconds for each job of the last frame presented"""
+        return self.__job_timings
+
+    @property
+    def frame_in_flight(self):
+        return self.__frame is not None
+
+    # model: WireframeModel, edges between vertices defined in 3D space
+    # edge_count: draw only about this many of the visible edges, evenly spread, None for all of them
+    def draw(self, eye: Vec3, center: Vec3, up: Vec3, fovy, viewport_w, viewport_h, z_near, z_far,
+             model: WireframeModel, edge_count=None):
+        """begin_frame and block until the frame is presented, False when there is no canvas"""
+        if not self.begin_frame(eye, center, up, fovy, viewport_w, viewport_h, z_near, z_far, model, edge_count):
+            return False
+
+        while True:
+            ParallelJobSys.wait(self.__frame.futures)
+            presented = self.poll_frame()
+            if presented is not None:
+                return presented
+
+    def begin_frame(self, eye: Vec3, center: Vec3, up: Vec3, fovy, viewport_w, viewport_h, z_near, z_far,
+                    model: WireframeModel, edge_count=None):
+        """push the jobs of a frame and return without waiting for them, see draw for the arguments
+
+        the caller keeps calling poll_frame until the frame has ended, only then the next one can begin,
+        returns False when there is no canvas to draw on
+        """
+        if self.__frame:
+            raise Exception('a frame is still in flight')
         if not self.__canvas_intf:
-            return
+            return False
 
         self.__view_matrix.look_at(eye, center, up)
 
@@ -174,39 +430,114 @@ class Renderer:
             rt = tp * aspect
             self.__projection_matrix.ortho(-rt, rt, -tp, tp, z_near, z_far)
 
-        # setup parameters
-        mvp = self.__projection_matrix * self.__view_matrix
-
-        # emit tasks
-        line2d_pools1 = []
-        line2d_pools2 = []
-        line2d_pools3 = []
-        line2d_pools4 = []
-        line2d_pools_list = [line2d_pools1, line2d_pools2, line2d_pools3, line2d_pools4]
-
-        sz_of_lines = len(lines)
-        d = sz_of_lines // 4
-        job_count_list = [d, d, d, d + sz_of_lines % 4]
-
-        self.__finished_tasks = 0
-        post_job_count = 0
-        start_idx = 0
-        for i in range(0, 4):
-            cur_job_line_cnt = job_count_list[i]
-            if cur_job_line_cnt > 0:
-                job = Renderer.RunGeometryPipeline(self, self.__clip_planes, mvp, viewport_w, viewport_h,
-                                                   lines, start_idx, start_idx + cur_job_line_cnt,
-                                                   line2d_pools_list[i])
-                start_idx += cur_job_line_cnt
-                self.__parallel_job_sys.push_job(job)
-                post_job_count += 1
-
-        # wait tasks finish
-        while self.__get_finished_tasks() < post_job_count:
-            time.sleep(0.001)
+        # setup parameters, the jobs of the frame read the mvp matrix until they are done
+        mvp = self.__projection_matrix.mul_into(self.__view_matrix, self.__mvp_matrix)
+
+        shared_model = self.__share_model(model)
+
+        # only the parts of the model the bvh can not rule out, the clip planes in model space are the
+        # planes of the clip volume times the mvp
+        if model.bvh is not None:
+            edge_ranges = model.bvh.visible_ranges(self.__clip_planes @ mvp.to_array())
+        else:
+            edge_ranges = np.array([[0, len(model.edges)]], np.int64)
+        sz_of_lines = int((edge_ranges[:, 1] - edge_ranges[:, 0]).sum())
+
+        # a stride over the edges in bvh order keeps a decimated frame evenly spread over the model
+        edge_step = 1
+        if edge_count is not None and edge_count < sz_of_lines:
+            edge_step = -(-sz_of_lines // edge_count)
+
+        frame = Renderer.Frame(shared_model, mvp, viewport_w, viewport_h, edge_ranges, edge_step)
+        self.__frame = frame
+
+        # the vertex stage pays off once the edges have more end points than the model has vertices, with few
+        # visible edges they are transformed on their own
+        vertex_count = len(model.vertices)
+        if (sz_of_lines // edge_step) * 2 >= vertex_count:
+            frame.clip_vertices = shared_model.clip_vertices
+            frame.outcodes = shared_model.outcodes
+
+            chunk_count = self.__parallel_job_sys.worker_count * Renderer.CHUNKS_PER_WORKER
+            vertex_chunk_size = max(Renderer.MIN_CHUNK_VERTICES, -(-vertex_count // chunk_count))
+            for start_idx in range(0, vertex_count, vertex_chunk_size):
+                stop_idx = min(start_idx + vertex_chunk_size, vertex_count)
+                job = Renderer.RunVertexStage(self.__clip_planes, mvp, shared_model.vertices, start_idx, stop_idx,
+                                              frame.clip_vertices[:, start_idx:stop_idx],
+                                              frame.outcodes[start_idx:stop_idx])
+                frame.vertex_futures.append(self.__parallel_job_sys.push_job(job))
+
+            if frame.vertex_futures:
+                return True
+
+        self.__push_line_jobs(frame)
+        return True
+
+    def __push_line_jobs(self, frame):
+        # emit tasks, many small chunks
+        edge_ranges = frame.edge_ranges
+        edge_step = frame.edge_step
+        sz_of_lines = int((edge_ranges[:, 1] - edge_ranges[:, 0]).sum())
+        chunk_count = self.__parallel_job_sys.worker_count * Renderer.CHUNKS_PER_WORKER
+        chunk_size = max(Renderer.MIN_CHUNK_EDGES, -(-sz_of_lines // edge_step // chunk_count)) * edge_step
+
+        shared_model = frame.shared_model
+        out_lines = shared_model.out_lines
+        out_start = 0
+        for job_ranges in split_ranges(edge_ranges, chunk_size):
+            out_count = int((-(-(job_ranges[:, 1] - job_ranges[:, 0]) // edge_step)).sum())
+            job = Renderer.RunGeometryPipeline(self.__clip_planes, frame.mvp, frame.viewport_w, frame.viewport_h,
+                                               shared_model.vertices, shared_model.edges, job_ranges, edge_step,
+                                               out_lines[out_start:out_start + out_count], frame.clip_vertices,
+                                               frame.outcodes)
+            frame.line_futures.append((out_start, self.__parallel_job_sys.push_job(job)))
+            out_start += out_count
+
+    def poll_frame(self):
+        """move the frame of begin_frame on once the jobs of its stage are done
+
+        None while jobs are in flight, then True when the frame was presented, False when it was dropped or
+        there is no frame
+        """
+        frame = self.__frame
+        if frame is None:
+            return False
+        if not ParallelJobSys.wait(frame.futures, 0):
+            return None
+
+        if frame.dropped:
+            self.__frame = None
+            return False
+
+        frame.job_timings += [(future.exec_time, future.total_time) for future in frame.futures]
+        if not frame.line_futures:
+            # the vertex stage is done, the lines gather the end points from its output
+            self.__push_line_jobs(frame)
+            if frame.line_futures:
+                return None
+
+        self.__frame = None
+        self.__job_timings = frame.job_timings
 
         # present
+        out_lines = frame.shared_model.out_lines
         self.__canvas_intf.clear()
-        for i in range(0, 4):
-            for line2d in line2d_pools_list[i]:
-                self.__canvas_intf.draw_line(line2d[0], line2d[1])
+        for out_start, future in frame.line_futures:
+            try:
+                line_count = future.result()
+            except Exception as e:
+                print(f'Renderer job error: {e}\n')
+                continue
+            if line_count > 0:
+                self.__canvas_intf.draw_lines(out_lines[out_start:out_start + line_count])
+        self.__canvas_intf.present()
+
+        return True
+
+    def drop_frame(self):
+        """the frame in flight is out of date, its jobs no worker has started are cancelled and the canvas keeps
+        what it shows, poll_frame ends the frame once the running jobs are done
+        """
+        if self.__frame and not self.__frame.dropped:
+            self.__parallel_job_sys.cancel_pending()
+            self.__frame.dropped = True